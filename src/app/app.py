@@ -1,12 +1,32 @@
 from flask import Flask, render_template, request, Response, jsonify, send_from_directory
 import os
-import cv2
 import time
 from werkzeug.utils import secure_filename
 import sys
 import os
+import threading
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from core.detector import TrafficDetector
+from core.model_pool import ModelPool
+from core.ledger import ViolationLedger
+from core.sessions import SessionRegistry
+from core.metrics import METRICS
+from core.broadcast import FrameBroadcaster, level_for_quality
+from core.store import ViolationStore
+from core.checkpoint import JobCheckpoint, input_fingerprint
+from core.scheduler import CameraScheduler
+from core.uploads import UploadRegistry
+
+def parse_pairs(text):
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}; a bare value (no name) is stored under None."""
+    pairs = {}
+    for entry in (text or '').split(','):
+        name, sep, value = entry.partition('=')
+        if not sep:
+            name, value = None, name
+        if value.strip():
+            pairs[name.strip() if name is not None else None] = value.strip()
+    return pairs
 
 def create_app(template_folder=None, static_folder=None):
     app = Flask(__name__, 
@@ -19,97 +39,183 @@ def create_app(template_folder=None, static_folder=None):
     OUTPUT_FOLDER = os.path.join(BASE_DIR, 'data', 'output')
     app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
     app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
+    # Optional per-frame latency budget; quality adapts to stay within it
+    latency_target = os.environ.get('TRAFFIC_LATENCY_MS')
+    app.config['LATENCY_TARGET_MS'] = float(latency_target) if latency_target else None
+    # Skip inference on static frames (quiet cameras)
+    app.config['MOTION_GATING'] = os.environ.get('TRAFFIC_MOTION_GATING', '0') == '1'
+    # Violation model on crops around tracked motorcycles instead of the whole frame
+    app.config['CROP_VIOLATIONS'] = os.environ.get('TRAFFIC_CROP_VIOLATIONS', '0') == '1'
+    # Stop analysing a stream once nobody has watched it for this many seconds
+    app.config['STREAM_IDLE_TIMEOUT'] = float(os.environ.get('TRAFFIC_STREAM_IDLE_TIMEOUT', '30'))
+    # Full annotated video and/or short evidence clips around violations (clips cost a
+    # JPEG encode per frame plus a few seconds of pre-roll per stream, so they are opt-in)
+    app.config['FULL_VIDEO'] = os.environ.get('TRAFFIC_FULL_VIDEO', '1') == '1'
+    app.config['EVIDENCE'] = os.environ.get('TRAFFIC_EVIDENCE', '0') == '1'
+    app.config['EVIDENCE_FOLDER'] = os.path.join(OUTPUT_FOLDER, 'evidence')
+    # Searchable violation history (SQLite)
+    app.config['VIOLATION_DB'] = os.environ.get('TRAFFIC_DB', os.path.join(OUTPUT_FOLDER, 'violations.db'))
+    # Frames between resume checkpoints (0 disables); a restarted server resumes the video
+    app.config['CHECKPOINT_EVERY'] = int(os.environ.get('TRAFFIC_CHECKPOINT_EVERY', '900'))
+    app.config['CHECKPOINT_FOLDER'] = os.path.join(OUTPUT_FOLDER, 'checkpoints')
+    # Live cameras as "name=url,name2=url2" (RTSP/HTTP URLs, device indexes, or video files
+    # looped in real time as stand-ins); watched with /video_feed?camera=name
+    app.config['CAMERAS'] = {name: url for name, url in parse_pairs(os.environ.get('TRAFFIC_CAMERAS')).items()
+                             if name}
+    # Analyse every camera continuously on one shared model pool (instead of per viewer),
+    # each within its own FPS budget: "5,gate=10" = 5 fps by default, 10 for 'gate'
+    app.config['SCHEDULE_CAMERAS'] = os.environ.get('TRAFFIC_SCHEDULE_CAMERAS', '0') == '1'
+    app.config['CAMERA_FPS'] = parse_pairs(os.environ.get('TRAFFIC_CAMERA_FPS', '5'))
+    app.config['CAMERA_PRIORITY'] = parse_pairs(os.environ.get('TRAFFIC_CAMERA_PRIORITY'))
+    app.config['SCHEDULER_WORKERS'] = int(os.environ.get('TRAFFIC_SCHEDULER_WORKERS', '2'))
+    app.config['SCHEDULER_POLICY'] = os.environ.get('TRAFFIC_SCHEDULER_POLICY', 'round_robin')
+    # Violation-model micro-batch size shared by every stream on the process-wide models
+    # (1 disables): frames of concurrent uploads / scheduled cameras go through one predict
+    app.config['BATCH_SIZE'] = int(os.environ.get('TRAFFIC_BATCH_SIZE', '1'))
 
     # Ensure dirs exist
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-    # Initialize Detector (Removed global instance to prevent state issues)
-    # detector = TrafficDetector()
+    # Models are loaded once per process and shared by every stream.
+    # Preload in the background so the server starts immediately.
+    threading.Thread(target=ModelPool.shared, daemon=True).start()
+
+    # One session (own ledger/stats) per /video_feed, so concurrent uploads never mix counts
+    sessions = SessionRegistry()
+
+    # First-seen violations of every session, written in batches off the frame path
+    store = ViolationStore(app.config['VIOLATION_DB'])
+
+    # Chunked, resumable uploads; analysis can follow a file while it is still arriving
+    uploads = UploadRegistry(UPLOAD_FOLDER)
 
-    # Global Stats Store
-    current_stats = {
-        'signal': 0,
-        'helmet': 0,
-        'triple': 0,
-        'traffic_helmet': 0,  # Renamed from 'combined'
-        'multiple': 0  # New counter for multiple violations
-    }
+    # Always-on camera scheduler (set once the shared models are loaded)
+    scheduled = {}
 
-    # Dictionary to track violations per vehicle
-    vehicle_violations = {}
+    def start_scheduler():
+        scheduler = CameraScheduler(pool=ModelPool.shared(), workers=app.config['SCHEDULER_WORKERS'],
+                                    policy=app.config['SCHEDULER_POLICY'],
+                                    motion_gating=app.config['MOTION_GATING'],
+                                    batch_size=app.config['BATCH_SIZE'],
+                                    evidence_dir=app.config['EVIDENCE_FOLDER'] if app.config['EVIDENCE'] else None)
+        default_fps = float(app.config['CAMERA_FPS'].get(None, 5))
+        for name, url in app.config['CAMERAS'].items():
+            # Each camera is a long-running session that viewers of /video_feed?camera= join
+            session = sessions.create(video_path=name)
+            session.broadcaster = FrameBroadcaster()
+            camera = scheduler.add_camera(name, url,
+                                          target_fps=float(app.config['CAMERA_FPS'].get(name, default_fps)),
+                                          priority=int(app.config['CAMERA_PRIORITY'].get(name, 0)),
+                                          broadcaster=session.broadcaster, on_result=record_result(session))
+            session.detector = camera.detector
+        scheduled['scheduler'] = scheduler.start()
+
+    def record_result(session):
+        def on_result(camera, frame_count, frame, violations):
+            new = session.ledger.record(violations)
+            session.frames = frame_count
+            if new:
+                store.add(new, video=session.video_path, session=session.id, frame=frame_count)
+        return on_result
+
+    if app.config['SCHEDULE_CAMERAS'] and app.config['CAMERAS']:
+        threading.Thread(target=start_scheduler, daemon=True).start()
 
     @app.route('/')
     def index():
         return render_template('index.html')
 
-    def generate_frames(path):
-        global current_stats, vehicle_violations
-        # Reset stats for new video
-        current_stats = {'signal': 0, 'helmet': 0, 'triple': 0, 'traffic_helmet': 0, 'multiple': 0}
-        vehicle_violations = {}
+    def checkpoint_path(path):
+        return os.path.join(app.config['CHECKPOINT_FOLDER'], os.path.basename(path) + '.json')
+
+    def run_session(path, session, live=False, follow=None):
+        """Analysis loop of one session; runs on its own thread and publishes to the broadcaster."""
+        ledger = session.ledger
+        broadcaster = session.broadcaster
         
-        # Instantiate detector for this specific session to ensure clean state
-        # This might add a small delay on start, but ensures tracking is fresh and robust
-        local_detector = TrafficDetector()
+        # Lightweight session on top of the shared models: fresh tracker state,
+        # no weights reloaded from disk
+        local_detector = TrafficDetector(pool=ModelPool.shared())
+        session.detector = local_detector
         
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], 'processed_' + os.path.basename(path))
+        # Pick up where an interrupted run of the same video stopped (a live camera just restarts)
+        checkpoint = None
+        resume = None
+        if app.config['CHECKPOINT_EVERY'] and not live:
+            checkpoint = JobCheckpoint(checkpoint_path(path), app.config['CHECKPOINT_EVERY'])
+            # Only for the very same file: a new upload under this name starts from the beginning
+            state = checkpoint.load(path)
+            if state is not None:
+                resume = state['detector']
+                ledger.load_state(state['ledger'])
+                session.frames = state['frame']
+                store.discard(video=session.video_path, after_frame=state['frame'], session=state.get('session'))
+
+        output_path = None
+        if app.config['FULL_VIDEO'] and not live:
+            # A resumed run continues in a new file named after its first frame
+            suffix = f".from{resume['frame']}" if resume else ''
+            base, ext = os.path.splitext('processed_' + os.path.basename(path))
+            output_path = os.path.join(app.config['OUTPUT_FOLDER'], base + suffix + ext)
+        evidence_dir = None
+        if app.config['EVIDENCE']:
+            evidence_dir = os.path.join(app.config['EVIDENCE_FOLDER'], session.id)
+
+        def save_checkpoint():
+            checkpoint.save({
+                'input': input_fingerprint(path),
+                'session': session.id,
+                'frame': session.frames,
+                'detector': local_detector.checkpoint_state(),
+                'ledger': ledger.state(),
+            })
         
+        finished = False
         try:
             # Process
-            for frame, violations in local_detector.process_video(path, output_path):
-                
-                # Update Stats from Violations (with enhanced tracking)
-                for v in violations:
-                    v_type = v.get('type', '')
-                    track_id = v.get('track_id')
-                
-                    # Track violations per vehicle
-                    if track_id is not None:
-                        if track_id not in vehicle_violations:
-                            vehicle_violations[track_id] = set()
-                        
-                        # Add this violation type to the vehicle's violations
-                        vehicle_violations[track_id].add(v_type)
-                        
-                        # Create a unique key for this specific violation instance
-                        violation_key = f"{track_id}_{v_type}"
-                        
-                        # Only count if we haven't seen this ID + Violation combination yet
-                        if violation_key not in [f"{tid}_{vt}" for tid in vehicle_violations.keys() for vt in vehicle_violations[tid] if tid == track_id and vt == v_type]:
-                            # Count individual violations
-                            if 'Signal' in v_type: 
-                                current_stats['signal'] += 1
-                            elif 'Helmet' in v_type: 
-                                current_stats['helmet'] += 1
-                            elif 'Triple' in v_type: 
-                                current_stats['triple'] += 1
-                
-                # Update multiple violations counter
-                for track_id, violations_set in vehicle_violations.items():
-                    if len(violations_set) >= 2:  # Vehicle has multiple violations
-                        # Create unique key for multiple violations tracking
-                        multiple_key = f"{track_id}_multiple"
-                        if multiple_key not in [f"{tid}_multiple" for tid in vehicle_violations.keys()]:
-                            current_stats['multiple'] += 1
+            for frame, violations in local_detector.process_video(
+                    path, output_path, pipelined=True, latency_target_ms=app.config['LATENCY_TARGET_MS'],
+                    batch_size=app.config['BATCH_SIZE'], shared_batcher=True,
+                    motion_gating=app.config['MOTION_GATING'],
+                    crop_violations=app.config['CROP_VIOLATIONS'], evidence_dir=evidence_dir,
+                    resume=resume, live=live, follow=follow):
                 
-                # Update traffic_helmet counter (vehicles with both signal and helmet violations)
-                for track_id, violations_set in vehicle_violations.items():
-                    if 'Signal' in str(violations_set) and 'Helmet' in str(violations_set):
-                        traffic_helmet_key = f"{track_id}_traffic_helmet"
-                        if traffic_helmet_key not in [f"{tid}_traffic_helmet" for tid in vehicle_violations.keys()]:
-                            current_stats['traffic_helmet'] += 1
+                # Update Stats from Violations (each track_id + type counted once)
+                new = ledger.record(violations)
+                # Source frame number (live cameras skip the frames analysis was too slow for)
+                session.frames = local_detector.frame_position
+                if new:
+                    store.add(new, video=session.video_path, session=session.id, frame=session.frames)
             
-                # Encode frame for web
-                ret, buffer = cv2.imencode('.jpg', frame)
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                if checkpoint is not None and checkpoint.due(session.frames):
+                    save_checkpoint()
+            
+                # Hand the frame to the viewers; encoding happens on their threads
+                broadcaster.publish(frame)
+                if broadcaster.idle_seconds() > app.config['STREAM_IDLE_TIMEOUT']:
+                    print(f"No viewers left for session {session.id}, stopping.")
+                    # Opening the video again continues from here
+                    if checkpoint is not None:
+                        save_checkpoint()
+                    break
+            else:
+                finished = True
                        
         except Exception as e:
             print(f"Error in video processing: {e}")
         finally:
-            print("Finished processing video request.")
+            if finished and checkpoint is not None:
+                checkpoint.remove()
+            broadcaster.close()
+            sessions.finish(session)
+            print(f"Finished processing video request (session {session.id}).")
+
+    def generate_frames(broadcaster, level=None, max_width=None):
+        """MJPEG body for one viewer (latest-frame-wins, per-client quality)."""
+        for frame_bytes in broadcaster.frames(level=level, max_width=max_width):
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
     @app.route('/upload', methods=['POST'])
     def upload_video():
@@ -128,10 +234,89 @@ def create_app(template_folder=None, static_folder=None):
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             print(f"DEBUG: Saving file to {filepath}")
             file.save(filepath)
-            return jsonify({'message': 'File uploaded successfully', 'filepath': filename})
+            # Whatever was analysed under this name before is gone
+            JobCheckpoint(checkpoint_path(filepath)).remove()
+            # Session id the client passes to /video_feed and /stats
+            return jsonify({'message': 'File uploaded successfully', 'filepath': filename,
+                            'session': sessions.new_id()})
+
+    @app.route('/upload/chunked', methods=['POST'])
+    def start_chunked_upload():
+        # Body: {"filename": ..., "size": total bytes (optional, checked on completion)}
+        data = request.get_json(silent=True) or {}
+        filename = secure_filename(data.get('filename') or '')
+        if not filename:
+            filename = f"video_{int(time.time())}.mp4"
+        upload = uploads.create(filename, total=data.get('size'))
+        JobCheckpoint(checkpoint_path(upload.path)).remove()
+        # filepath + session can go to /video_feed right away; analysis follows the upload
+        return jsonify(dict(upload.info(), session=sessions.new_id()))
+
+    @app.route('/upload/chunked/<upload_id>', methods=['GET', 'PUT'])
+    def chunked_upload(upload_id):
+        upload = uploads.get(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Unknown upload'}), 404
+        if request.method == 'GET':
+            # Where to resume after a lost chunk or a reconnect
+            return jsonify(upload.info())
+        offset = request.args.get('offset', type=int)
+        if offset is None:
+            return jsonify({'error': 'No offset provided'}), 400
+        try:
+            # Raw chunk body, streamed to disk block by block
+            uploads.write(upload, offset, request.stream)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'offset': upload.received}), 409
+        return jsonify(upload.info())
+
+    @app.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+    def complete_chunked_upload(upload_id):
+        upload = uploads.get(upload_id)
+        if upload is None:
+            return jsonify({'error': 'Unknown upload'}), 404
+        try:
+            uploads.complete(upload)
+        except ValueError as e:
+            return jsonify({'error': str(e), 'offset': upload.received}), 400
+        return jsonify(upload.info())
 
     @app.route('/video_feed')
     def video_feed():
+        session_id = request.args.get('session')
+        # Best quality a client wants: a ladder step (?level=0-4, 0 is best) or a JPEG quality (?quality=1-100)
+        level = request.args.get('level', type=int)
+        quality = request.args.get('quality', type=int)
+        if level is None and quality is not None:
+            level = level_for_quality(quality)
+        max_width = request.args.get('width', type=int)
+
+        # Another viewer of a running session shares its stream instead of re-processing
+        session = sessions.get(session_id) if session_id else None
+        if session is not None and session.active and session.broadcaster is not None:
+            response = Response(generate_frames(session.broadcaster, level, max_width),
+                                mimetype='multipart/x-mixed-replace; boundary=frame')
+            response.headers['X-Session-Id'] = session.id
+            return response
+
+        camera = request.args.get('camera')
+        if camera:
+            url = app.config['CAMERAS'].get(camera)
+            if url is None:
+                return "Error: Unknown camera", 404
+            # One analysis per camera, however many people watch it
+            session = sessions.running(camera)
+            if session is None and app.config['SCHEDULE_CAMERAS']:
+                return "Error: Camera scheduler is starting", 503
+            if session is None or session.broadcaster is None:
+                session = sessions.create(session_id, video_path=camera)
+                session.broadcaster = FrameBroadcaster()
+                threading.Thread(target=run_session, args=(url, session, True), daemon=True).start()
+            response = Response(generate_frames(session.broadcaster, level, max_width),
+                                mimetype='multipart/x-mixed-replace; boundary=frame')
+            response.headers['X-Session-Id'] = session.id
+            return response
+
         filename = request.args.get('path')
         if not filename:
             return "Error: No path provided", 400
@@ -144,11 +329,72 @@ def create_app(template_folder=None, static_folder=None):
             print(f"ERROR: Video file not found at {video_path}")
             return "Error: File not found", 404
             
-        return Response(generate_frames(video_path), mimetype='multipart/x-mixed-replace; boundary=frame')
+        # A file still being uploaded is analysed as it arrives
+        follow = None
+        if not uploads.is_complete(filename):
+            follow = lambda: uploads.is_complete(filename)
+
+        # Each feed gets its own session; reuse the id handed out by /upload if given
+        session = sessions.create(session_id, video_path=filename)
+        session.broadcaster = FrameBroadcaster()
+        threading.Thread(target=run_session, args=(video_path, session), kwargs={'follow': follow},
+                         daemon=True).start()
+        response = Response(generate_frames(session.broadcaster, level, max_width),
+                            mimetype='multipart/x-mixed-replace; boundary=frame')
+        response.headers['X-Session-Id'] = session.id
+        return response
 
     @app.route('/stats')
     def get_stats():
-        return jsonify(current_stats)
+        session_id = request.args.get('session')
+        session = sessions.get(session_id) if session_id else sessions.latest()
+        if session is None:
+            # Not started yet (or already pruned): report empty counters
+            return jsonify({key: 0 for key in ViolationLedger.STAT_KEYS})
+        return jsonify(session.ledger.snapshot())
+
+    @app.route('/violations')
+    def list_violations():
+        # Newest first; pass the returned next_cursor as ?cursor= for the next page
+        args = request.args
+        try:
+            rows, next_cursor = store.query(
+                type=args.get('type'), video=args.get('video'), session=args.get('session'),
+                track_id=args.get('track_id'), since=args.get('since', type=float),
+                until=args.get('until', type=float), cursor=args.get('cursor', type=int),
+                limit=args.get('limit', 100, type=int))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'violations': rows, 'next_cursor': next_cursor})
+
+    @app.route('/metrics')
+    def metrics():
+        # Prometheus text format: per-stage timing histograms + frame/detection/violation counters
+        return Response(METRICS.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/cameras')
+    def list_cameras():
+        # Configured cameras, the session currently analysing each (if any) and its schedule
+        scheduler = scheduled.get('scheduler')
+        schedule = {c['camera']: c for c in scheduler.stats()['cameras']} if scheduler is not None else {}
+        result = []
+        for name in app.config['CAMERAS']:
+            session = sessions.running(name)
+            result.append({'camera': name, 'session': session.info() if session is not None else None,
+                           'schedule': schedule.get(name)})
+        return jsonify(result)
+
+    @app.route('/scheduler')
+    def scheduler_stats():
+        # Per-camera achieved fps, skipped slots and lag; 'oversubscribed' when the box cannot keep up
+        scheduler = scheduled.get('scheduler')
+        if scheduler is None:
+            return jsonify({'error': 'Camera scheduler is not running'}), 404
+        return jsonify(scheduler.stats())
+
+    @app.route('/sessions')
+    def list_sessions():
+        return jsonify(sessions.list())
 
     return app
 
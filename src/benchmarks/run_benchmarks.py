@@ -0,0 +1,247 @@
+"""
+Offline benchmark suite for the detection pipeline.
+
+Times night enhancement, detection (analyze_frame), rendering, VideoWriter
+output and JPEG encoding separately on synthetic night frames, using deterministic stub
+models in place of YOLO (no GPU, no network, no weights). Also runs
+process_video end to end and times FrameSource decoding (every frame,
+strided, downscaled). Results are written as JSON so two runs can be
+diffed or compared with ``--compare``.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --resolutions 1280x720 1920x1080 --frames 60
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.stub_models import StubModelPool, synthetic_night_frames
+from core.detector import TrafficDetector
+from core.frame_source import FrameSource
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_RESOLUTIONS = ['640x360', '1280x720', '1920x1080']
+
+
+def summarize(samples_ms):
+    """Latency percentiles (ms) for one stage."""
+    arr = np.asarray(samples_ms, dtype=np.float64)
+    if arr.size == 0:
+        return {}
+    return {
+        'count': int(arr.size),
+        'mean': round(float(arr.mean()), 3),
+        'p50': round(float(np.percentile(arr, 50)), 3),
+        'p90': round(float(np.percentile(arr, 90)), 3),
+        'p99': round(float(np.percentile(arr, 99)), 3),
+        'max': round(float(arr.max()), 3),
+    }
+
+
+def _make_detector(options):
+    pool = StubModelPool(vehicles=options['vehicles'], persons=options['persons'],
+                         motorcycles=options['motorcycles'], violations=options['violations'],
+                         base_latency_ms=options['base_latency_ms'],
+                         violation_latency_ms=options['violation_latency_ms'])
+    return TrafficDetector(pool=pool)
+
+
+def bench_stages(frames, options, warmup=3):
+    """Time each stage of the per-frame loop separately."""
+    height, width = frames[0].shape[:2]
+    detector = _make_detector(options)
+    stages = {'enhance': [], 'detect': [], 'render': [], 'write': [], 'jpeg': [], 'total': []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = cv2.VideoWriter(os.path.join(tmp, 'bench.mp4'), cv2.VideoWriter_fourcc(*'mp4v'),
+                                 30, (width, height))
+        tracemalloc.start()
+        for i, frame in enumerate(frames, 1):
+            t0 = time.perf_counter()
+            enhanced = detector.enhance_night_frame(frame)
+            t1 = time.perf_counter()
+            analysis = detector.analyze_frame(frame, enhanced, i)
+            t2 = time.perf_counter()
+            processed = detector.render(frame, analysis)
+            t3 = time.perf_counter()
+            writer.write(processed)
+            t4 = time.perf_counter()
+            cv2.imencode('.jpg', processed)
+            t5 = time.perf_counter()
+            if i <= warmup:
+                continue
+            stages['enhance'].append((t1 - t0) * 1000)
+            stages['detect'].append((t2 - t1) * 1000)
+            stages['render'].append((t3 - t2) * 1000)
+            stages['write'].append((t4 - t3) * 1000)
+            stages['jpeg'].append((t5 - t4) * 1000)
+            stages['total'].append((t5 - t0) * 1000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        writer.release()
+
+    result = {name: summarize(samples) for name, samples in stages.items()}
+    mean_total = result['total'].get('mean', 0)
+    result['fps'] = round(1000.0 / mean_total, 2) if mean_total else 0.0
+    result['peak_traced_mb'] = round(peak / 1e6, 2)
+    return result
+
+
+def _write_source(frames, path):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+
+
+def bench_decode(frames, stride=5):
+    """FrameSource throughput (source frames per second) reading all, every ``stride``-th and half-width frames."""
+    width = frames[0].shape[1]
+    result = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.avi')
+        _write_source(frames, source)
+        for name, kwargs in (('all', {}), (f'stride_{stride}', {'stride': stride}),
+                             ('half_width', {'max_width': width // 2})):
+            start = time.perf_counter()
+            with FrameSource(source, **kwargs) as reader:
+                returned = sum(1 for _ in reader)
+            elapsed = time.perf_counter() - start
+            result[name] = {
+                'frames': returned,
+                'seconds': round(elapsed, 4),
+                'source_fps': round(len(frames) / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+    return result
+
+
+def bench_process_video(frames, options, pipelined, headless=False):
+    """End-to-end process_video throughput on a synthetic clip (headless: no video, no drawing)."""
+    detector = _make_detector(options)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.avi')
+        _write_source(frames, source)
+
+        count = 0
+        start = time.perf_counter()
+        output = None if headless else os.path.join(tmp, 'out.mp4')
+        for _ in detector.process_video(source, output, pipelined=pipelined, render=not headless):
+            count += 1
+        elapsed = time.perf_counter() - start
+    return {
+        'frames': count,
+        'seconds': round(elapsed, 3),
+        'fps': round(count / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def run(resolutions, frame_count, options):
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'options': dict(options, frames=frame_count),
+        'results': {},
+    }
+    for res in resolutions:
+        width, height = (int(v) for v in res.lower().split('x'))
+        print(f"⏱️  {res}: {frame_count} frames")
+        frames = synthetic_night_frames(width, height, count=frame_count)
+        entry = bench_stages(frames, options)
+        entry['process_video'] = bench_process_video(frames, options, pipelined=False)
+        entry['process_video_pipelined'] = bench_process_video(frames, options, pipelined=True)
+        entry['process_video_headless'] = bench_process_video(frames, options, pipelined=False, headless=True)
+        entry['decode'] = bench_decode(frames)
+        report['results'][res] = entry
+        print(f"   enhance p50 {entry['enhance']['p50']} ms | detect p50 {entry['detect']['p50']} ms | "
+              f"render p50 {entry['render']['p50']} ms | write p50 {entry['write']['p50']} ms | jpeg p50 {entry['jpeg']['p50']} ms | "
+              f"{entry['fps']} fps | peak {entry['peak_traced_mb']} MB")
+
+    if resource is not None:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1e6 if sys.platform == 'darwin' else 1e3
+        report['peak_rss_mb'] = round(maxrss / scale, 2)
+    return report
+
+
+def compare(current, baseline):
+    """Print p50 / fps deltas between two reports."""
+    print("\n📈 Comparison with baseline (positive = slower)")
+    for res, entry in current['results'].items():
+        old = baseline.get('results', {}).get(res)
+        if not old:
+            continue
+        for stage in ('enhance', 'detect', 'render', 'write', 'jpeg', 'total'):
+            new_p50, old_p50 = entry[stage].get('p50'), old.get(stage, {}).get('p50')
+            if new_p50 is None or not old_p50:
+                continue
+            delta = (new_p50 - old_p50) / old_p50 * 100
+            print(f"   {res} {stage:8s} p50 {old_p50:8.3f} -> {new_p50:8.3f} ms ({delta:+.1f}%)")
+        if old.get('fps'):
+            delta = (entry['fps'] - old['fps']) / old['fps'] * 100
+            print(f"   {res} fps      {old['fps']:8.2f} -> {entry['fps']:8.2f} ({delta:+.1f}% throughput)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline with stub models.")
+    parser.add_argument('--resolutions', nargs='+', default=DEFAULT_RESOLUTIONS, help="WIDTHxHEIGHT list")
+    parser.add_argument('--frames', type=int, default=40, help="Frames per resolution")
+    parser.add_argument('--vehicles', type=int, default=8, help="Car boxes per frame")
+    parser.add_argument('--persons', type=int, default=6, help="Person boxes per frame")
+    parser.add_argument('--motorcycles', type=int, default=4, help="Motorcycle boxes per frame")
+    parser.add_argument('--violations', type=int, default=3, help="Violation-model boxes per frame (0 disables)")
+    parser.add_argument('--base-latency-ms', type=float, default=0.0, help="Simulated base-model latency")
+    parser.add_argument('--violation-latency-ms', type=float, default=0.0, help="Simulated violation-model latency")
+    parser.add_argument('-o', '--output', default=None, help="Result JSON path")
+    parser.add_argument('--compare', default=None, help="Baseline result JSON to compare against")
+    args = parser.parse_args()
+
+    options = {
+        'vehicles': args.vehicles,
+        'persons': args.persons,
+        'motorcycles': args.motorcycles,
+        'violations': args.violations,
+        'base_latency_ms': args.base_latency_ms,
+        'violation_latency_ms': args.violation_latency_ms,
+    }
+    report = run(args.resolutions, args.frames, options)
+
+    output = args.output
+    if output is None:
+        results_dir = os.path.join(os.path.dirname(__file__), 'results')
+        os.makedirs(results_dir, exist_ok=True)
+        output = os.path.join(results_dir, f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\n💾 Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
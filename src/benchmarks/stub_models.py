@@ -0,0 +1,144 @@
+"""
+Deterministic stand-ins for the ultralytics models used by the benchmarks.
+
+They return the same result structure the detector reads (``result.boxes``
+with ``xyxy`` / ``cls`` / ``id``) with a configurable number of boxes, so the
+pipeline can be timed without a GPU, network access or model weights.
+"""
+import threading
+import time
+
+import numpy as np
+
+from core.model_pool import ModelPool
+
+
+class StubBox:
+    def __init__(self, xyxy, cls, track_id=None):
+        self.xyxy = [np.asarray(xyxy, dtype=np.float32)]
+        self.cls = [cls]
+        self.id = None if track_id is None else [track_id]
+
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubYOLO:
+    """
+    Fake YOLO model.
+
+    Boxes are laid out on a grid and drift a few pixels per call so tracking
+    and carry-forward logic see realistic motion. ``latency_ms`` simulates the
+    cost of the real forward pass.
+    """
+
+    def __init__(self, names, counts, latency_ms=0.0, seed=0, tracked=False):
+        """
+        Args:
+            names (dict): Class id -> label, like ``YOLO.names``
+            counts (dict): Class id -> number of boxes returned per frame
+            latency_ms (float): Sleep per frame to simulate inference
+            seed (int): Seed for the box layout
+            tracked (bool): Attach track ids (base model)
+        """
+        self.names = names
+        self.counts = counts
+        self.latency_ms = latency_ms
+        self.tracked = tracked
+        self.predictor = None
+        self._rng = np.random.default_rng(seed)
+        self._layout = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def _boxes(self, shape):
+        height, width = shape[:2]
+        key = (height, width)
+        if key not in self._layout:
+            layout = []
+            next_id = 1
+            for cls, count in self.counts.items():
+                for _ in range(count):
+                    w = int(self._rng.integers(width // 30, width // 8))
+                    h = int(self._rng.integers(height // 20, height // 6))
+                    x = int(self._rng.integers(0, width - w))
+                    y = int(self._rng.integers(0, height - h))
+                    layout.append((cls, x, y, w, h, next_id))
+                    next_id += 1
+            self._layout[key] = layout
+
+        step = self._calls % 50
+        boxes = []
+        for cls, x, y, w, h, track_id in self._layout[key]:
+            dy = min(step * 2, height - h - y)
+            boxes.append(StubBox([x, y + dy, x + w, y + dy + h], cls, track_id if self.tracked else None))
+        return boxes
+
+    def _run(self, frame):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return StubResult(self._boxes(frame.shape))
+
+    def track(self, frame, persist=True, verbose=False, **kwargs):
+        with self._lock:
+            self._calls += 1
+            return [self._run(frame)]
+
+    def predict(self, source, verbose=False, **kwargs):
+        with self._lock:
+            self._calls += 1
+            if isinstance(source, list):
+                return [self._run(frame) for frame in source]
+            return [self._run(source)]
+
+
+class StubModelPool(ModelPool):
+    """ModelPool backed by StubYOLO models (no weights, no ultralytics import)."""
+
+    BASE_NAMES = {0: 'person', 2: 'car', 3: 'motorcycle', 5: 'bus', 7: 'truck'}
+    VIOLATION_NAMES = {0: 'no_helmet', 1: 'triple_riding', 2: 'signal_jump'}
+
+    def __init__(self, vehicles=8, persons=6, motorcycles=4, violations=3,
+                 base_latency_ms=0.0, violation_latency_ms=0.0, seed=0):
+        self.base_model_path = 'stub'
+        self.violation_model_path = 'stub'
+        self.base_model = StubYOLO(self.BASE_NAMES, {2: vehicles, 0: persons, 3: motorcycles},
+                                   latency_ms=base_latency_ms, seed=seed, tracked=True)
+        self.violation_model = None
+        if violations:
+            self.violation_model = StubYOLO(self.VIOLATION_NAMES, {0: violations},
+                                            latency_ms=violation_latency_ms, seed=seed + 1)
+
+        self.base_lock = threading.Lock()
+        self.violation_lock = threading.Lock()
+        self._tracker_template = None
+        self._batchers = {}
+        self._batchers_lock = threading.Lock()
+
+
+def synthetic_night_frames(width, height, count=30, seed=0):
+    """
+    Dark, noisy frames with a few bright blobs (headlights / street lamps).
+
+    Returns:
+        list: ``count`` BGR uint8 frames
+    """
+    rng = np.random.default_rng(seed)
+    # Dark vertical gradient (sky -> road) as the base
+    gradient = np.linspace(8, 45, height, dtype=np.float32)[:, None, None]
+    base = np.broadcast_to(gradient, (height, width, 3))
+    frames = []
+    for i in range(count):
+        noise = rng.normal(0, 6, (height, width, 3)).astype(np.float32)
+        frame = np.clip(base + noise, 0, 255).astype(np.uint8)
+        for _ in range(6):
+            cx = int(rng.integers(0, width))
+            cy = int(rng.integers(height // 3, height))
+            radius = max(2, width // 80)
+            y0, y1 = max(0, cy - radius), min(height, cy + radius)
+            x0, x1 = max(0, cx - radius), min(width, cx + radius)
+            frame[y0:y1, x0:x1] = 230
+        frames.append(frame)
+    return frames
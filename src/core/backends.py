@@ -0,0 +1,253 @@
+"""
+Inference backends for the YOLO models.
+
+- 'torch':     ultralytics YOLO on the .pt weights (PyTorch eager)
+- 'onnx':      weights exported once to ONNX and run through ONNX Runtime
+- 'onnx-int8': the ONNX export with INT8 static quantization, calibrated on
+               frames from data/input
+
+Exported files are cached next to the weights (``<name>.onnx`` /
+``<name>.int8.onnx``) and rebuilt when the weights are newer. Ultralytics
+loads .onnx files through ONNX Runtime itself, so ``track()`` / ``predict()``
+and the result objects are the same for every backend.
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+from core.frame_source import FrameSource
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+DEFAULT_BACKEND = os.environ.get('TRAFFIC_BACKEND', 'torch')
+CALIBRATION_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'input')
+
+
+def _is_stale(derived, source):
+    return not os.path.exists(derived) or (
+        os.path.exists(source) and os.path.getmtime(derived) < os.path.getmtime(source))
+
+
+def onnx_path_for(weights):
+    """Cached ONNX export of ``weights`` (``<name>.onnx`` next to the .pt file)."""
+    return os.path.splitext(str(weights))[0] + '.onnx'
+
+
+def export_onnx(model, imgsz=640, force=False):
+    """
+    Export a loaded ultralytics model to ONNX next to its weights (cached).
+
+    Dynamic axes are kept so micro-batched predicts work.
+
+    Returns:
+        str: Path of the .onnx file
+    """
+    weights = str(model.ckpt_path)
+    onnx_path = onnx_path_for(weights)
+    if force or _is_stale(onnx_path, weights):
+        print(f"📦 Exporting {weights} to ONNX...")
+        onnx_path = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    return onnx_path
+
+
+def letterbox(frame, imgsz=640):
+    """Resize keeping aspect ratio and pad to a square, like ultralytics' LetterBox."""
+    height, width = frame.shape[:2]
+    scale = min(imgsz / height, imgsz / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - new_h) // 2, (imgsz - new_w) // 2
+    canvas[top:top + new_h, left:left + new_w] = resized
+    return canvas
+
+
+def to_input_tensor(frame, imgsz=640):
+    """BGR frame -> (1, 3, imgsz, imgsz) float32 RGB tensor in [0, 1]."""
+    image = letterbox(frame, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0
+
+
+def collect_calibration_frames(source_dir=CALIBRATION_DIR, count=64, enhancer=None):
+    """
+    Sample frames evenly from the videos (and images) under ``source_dir``.
+
+    Args:
+        source_dir (str): Directory searched recursively
+        count (int): Total frames to return
+        enhancer (NightEnhancer, optional): Applied to every frame, so the
+            violation model is calibrated on what it actually sees
+    """
+    videos = sorted(p for ext in ('mp4', 'avi', 'mov', 'mkv')
+                    for p in glob.glob(os.path.join(source_dir, '**', f'*.{ext}'), recursive=True))
+    images = sorted(p for ext in ('jpg', 'jpeg', 'png')
+                    for p in glob.glob(os.path.join(source_dir, '**', f'*.{ext}'), recursive=True))
+
+    frames = []
+    per_video = max(1, count // max(1, len(videos))) if videos else 0
+    for path in videos:
+        with FrameSource(path) as probe:
+            total = probe.frame_count or per_video
+        step = max(1, total // per_video)
+        # Frames we do not keep are grabbed (or seeked over) without decoding to BGR
+        with FrameSource(path, stride=step) as source:
+            for taken, (_, frame) in enumerate(source, 1):
+                frames.append(frame)
+                if taken >= per_video:
+                    break
+    for path in images:
+        if len(frames) >= count:
+            break
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames.append(frame)
+
+    frames = frames[:count]
+    if enhancer is not None:
+        frames = [enhancer.enhance(frame).copy() for frame in frames]
+    return frames
+
+
+def quantize_int8(onnx_path, calibration_frames, imgsz=640, force=False):
+    """
+    INT8 static quantization (QDQ) of an ONNX export, calibrated on real frames.
+
+    ``calibration_frames`` may be a callable returning the frames; it is only
+    called when the cached ``.int8.onnx`` is missing or stale.
+
+    Returns:
+        str: Path of the ``.int8.onnx`` file
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    int8_path = os.path.splitext(onnx_path)[0] + '.int8.onnx'
+    if not force and not _is_stale(int8_path, onnx_path):
+        return int8_path
+    if callable(calibration_frames):
+        calibration_frames = calibration_frames()
+    if not calibration_frames:
+        raise ValueError("INT8 quantization needs calibration frames (none found in data/input)")
+
+    model = onnx.load(onnx_path)
+    input_name = model.graph.input[0].name
+
+    class _FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(calibration_frames)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            return None if frame is None else {input_name: to_input_tensor(frame, imgsz)}
+
+    print(f"🧮 Quantizing {onnx_path} to INT8 with {len(calibration_frames)} calibration frames...")
+    quantize_static(onnx_path, int8_path, _FrameReader(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+
+    # Keep ultralytics metadata (class names, imgsz, stride) on the quantized model
+    quantized = onnx.load(int8_path)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(model.metadata_props)
+    onnx.save(quantized, int8_path)
+    return int8_path
+
+
+def load_model(weights, backend=None, imgsz=640, calibration_frames=None, reference=False):
+    """
+    Load ``weights`` with the requested backend.
+
+    With a fresh cached export the ONNX backends never touch PyTorch: the
+    eager model is only loaded to (re-)export, or when ``reference`` asks for it.
+
+    Args:
+        weights (str): .pt weights
+        backend (str): One of ``BACKENDS`` (defaults to $TRAFFIC_BACKEND or 'torch')
+        imgsz (int): Export / calibration input size
+        calibration_frames (list or callable, optional): Frames for INT8 calibration
+            (collected only when the model is actually re-quantized)
+        reference (bool): Also load the PyTorch model (e.g. for ``parity_check``)
+
+    Returns:
+        tuple: ``(model, torch_model)``; ``torch_model`` is the PyTorch reference
+        (same object as ``model`` for the torch backend, None when it was not loaded)
+    """
+    from ultralytics import YOLO
+
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Must be one of: {BACKENDS}")
+
+    if backend == 'torch':
+        torch_model = YOLO(weights)
+        return torch_model, torch_model
+
+    torch_model = None
+    onnx_path = onnx_path_for(weights)
+    if reference or _is_stale(onnx_path, weights):
+        torch_model = YOLO(weights)
+        onnx_path = export_onnx(torch_model, imgsz=imgsz)
+    if backend == 'onnx-int8':
+        if calibration_frames is None:
+            calibration_frames = collect_calibration_frames
+        onnx_path = quantize_int8(onnx_path, calibration_frames, imgsz=imgsz)
+
+    print(f"⚙️  Using {backend} backend: {onnx_path}")
+    return YOLO(onnx_path, task='detect'), torch_model
+
+
+def _match(reference, candidate, iou_threshold):
+    """Greedy same-class IoU matching between two (boxes, classes, confs) sets."""
+    from core.geometry import iou_matrix
+
+    ref_boxes, ref_cls, ref_conf = reference
+    cand_boxes, cand_cls, cand_conf = candidate
+    if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+        return [], []
+    ious = iou_matrix(ref_boxes, cand_boxes)
+    ious[ref_cls[:, None] != cand_cls[None, :]] = 0
+    matched_ious, conf_diffs = [], []
+    used = set()
+    for r in np.argsort(-ref_conf):
+        c = int(np.argmax(ious[r]))
+        if ious[r, c] >= iou_threshold and c not in used:
+            used.add(c)
+            matched_ious.append(float(ious[r, c]))
+            conf_diffs.append(abs(float(ref_conf[r]) - float(cand_conf[c])))
+    return matched_ious, conf_diffs
+
+
+def parity_check(reference_model, candidate_model, frames, conf=0.25, iou_threshold=0.5, min_recall=0.9):
+    """
+    Compare a backend against the PyTorch reference on the same frames.
+
+    Returns:
+        dict: recall of reference boxes, mean matched IoU, worst confidence
+        difference and ``passed`` (recall >= ``min_recall``)
+    """
+    def _extract(model, frame):
+        result = model.predict(frame, conf=conf, verbose=False)[0]
+        boxes = result.boxes
+        return (boxes.xyxy.cpu().numpy().astype(np.float32), boxes.cls.cpu().numpy().astype(int),
+                boxes.conf.cpu().numpy())
+
+    total = 0
+    matched_ious, conf_diffs = [], []
+    for frame in frames:
+        reference = _extract(reference_model, frame)
+        candidate = _extract(candidate_model, frame)
+        total += len(reference[0])
+        ious, diffs = _match(reference, candidate, iou_threshold)
+        matched_ious += ious
+        conf_diffs += diffs
+
+    recall = len(matched_ious) / total if total else 1.0
+    return {
+        'frames': len(frames),
+        'reference_boxes': total,
+        'matched': len(matched_ious),
+        'recall': round(recall, 4),
+        'mean_iou': round(float(np.mean(matched_ious)), 4) if matched_ious else None,
+        'max_conf_diff': round(float(np.max(conf_diffs)), 4) if conf_diffs else None,
+        'passed': recall >= min_recall,
+    }
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Gathers frames from one or more streams into batched predict calls.
+
+    Callers ``submit()`` a frame and get a ``Future``. A background thread
+    waits until ``batch_size`` frames are queued or the oldest one has
+    waited ``max_delay`` seconds, runs one batched predict and resolves each
+    future with the results for its own frame.
+    """
+
+    def __init__(self, predict_fn, batch_size=8, max_delay=0.03):
+        """
+        Args:
+            predict_fn (callable): Takes a list of frames, returns one result per frame
+            batch_size (int): Maximum frames per predict call
+            max_delay (float): Longest time (seconds) a frame waits for a batch to fill
+        """
+        self.predict_fn = predict_fn
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay = float(max_delay)
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        # Stats
+        self.batches = 0
+        self.frames = 0
+
+    def submit(self, frame):
+        """Queue a frame; the future resolves to the list of results for it."""
+        future = Future()
+        self._queue.put((frame, future))
+        return future
+
+    def predict(self, frame):
+        """Blocking helper: submit a frame and wait for its results."""
+        return self.submit(frame).result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'frames': self.frames,
+            'mean_batch_size': round(self.frames / self.batches, 2) if self.batches else 0.0,
+        }
+
+    def _collect(self, first):
+        """Fill a batch starting with ``first`` until it is full or the deadline passes."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        stop = False
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+
+            frames = [frame for frame, _ in batch]
+            try:
+                results = self.predict_fn(frames)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result([result])
+                self.batches += 1
+                self.frames += len(batch)
+
+            if stop:
+                return
@@ -0,0 +1,192 @@
+import threading
+import time
+
+import cv2
+
+from core.metrics import METRICS
+
+
+# Output variants, best first: (scale of the processed frame, JPEG quality).
+# Slow clients step down this ladder; clients on the same step share encodes.
+QUALITY_LEVELS = (
+    (1.0, 80),
+    (1.0, 65),
+    (0.75, 60),
+    (0.5, 50),
+    (0.35, 40),
+)
+
+
+def level_for_quality(quality):
+    """Best ``QUALITY_LEVELS`` step whose JPEG quality does not exceed ``quality`` (1-100)."""
+    for level, (_, step_quality) in enumerate(QUALITY_LEVELS):
+        if step_quality <= quality:
+            return level
+    return len(QUALITY_LEVELS) - 1
+
+
+class _Client:
+    """Per-subscriber delivery state: last frame seen and current quality step."""
+
+    def __init__(self, level=0, max_width=None, adaptive=True):
+        self.level = level
+        self.min_level = level
+        self.max_width = max_width
+        self.adaptive = adaptive
+        self.last_seq = 0
+        self.sent = 0
+        self.dropped = 0
+        self._recent = []   # dropped-frame counts of the last deliveries
+
+    def delivered(self, skipped, window=10, degrade_ratio=0.5):
+        """Record one delivery that skipped ``skipped`` frames; adapt the quality step."""
+        self.sent += 1
+        self.dropped += skipped
+        if not self.adaptive:
+            return
+        self._recent.append(skipped)
+        if len(self._recent) < window:
+            return
+        drop_ratio = sum(self._recent) / float(sum(self._recent) + len(self._recent))
+        self._recent = []
+        if drop_ratio > degrade_ratio and self.level < len(QUALITY_LEVELS) - 1:
+            self.level += 1
+        elif drop_ratio == 0 and self.level > self.min_level:
+            self.level -= 1
+
+
+class FrameBroadcaster:
+    """
+    Shares one stream of processed frames with any number of MJPEG clients.
+
+    The producer (the analysis loop) only swaps in the newest frame and never
+    waits for viewers. Each client wakes up, takes whatever frame is newest
+    (latest-frame-wins: frames it was too slow for are dropped) and gets it
+    JPEG-encoded at its own quality step. Each (frame, variant) is encoded once
+    and shared by every client on that step, and encoding runs on the client
+    threads, so viewer network speed never slows down detection.
+    """
+
+    def __init__(self, metrics=None, encode_cache=4):
+        """
+        Args:
+            metrics (MetricsRegistry, optional): Where 'encode' timings and drop counters go
+            encode_cache (int): Encoded variants kept for the current frame
+        """
+        self.metrics = metrics if metrics is not None else METRICS
+        self.encode_cache = encode_cache
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._closed = False
+        self._clients = set()
+        self._last_client_left = time.time()
+
+        self._encode_lock = threading.Lock()
+        self._encoded = {}   # (seq, level, max_width) -> jpeg bytes
+
+        # Stats
+        self.encodes = 0
+
+    # --- Producer side ---
+    def publish(self, frame):
+        """Make ``frame`` the newest frame (the caller must not modify it afterwards)."""
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def close(self):
+        """No more frames: clients finish after the last one."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def client_count(self):
+        with self._cond:
+            return len(self._clients)
+
+    def idle_seconds(self):
+        """Seconds since the last client left (0 while anyone is watching)."""
+        with self._cond:
+            if self._clients:
+                return 0.0
+            return time.time() - self._last_client_left
+
+    # --- Consumer side ---
+    def _encode(self, seq, frame, client):
+        key = (seq, client.level, client.max_width)
+        with self._encode_lock:
+            data = self._encoded.get(key)
+            if data is not None:
+                return data
+            scale, quality = QUALITY_LEVELS[client.level]
+            height, width = frame.shape[:2]
+            if client.max_width:
+                scale = min(scale, client.max_width / float(width))
+            with self.metrics.stage('encode'):
+                if scale < 1.0:
+                    frame = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                                       interpolation=cv2.INTER_AREA)
+                ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            data = buffer.tobytes() if ok else None
+            # Only the newest frames' variants are worth keeping
+            for old in [k for k in self._encoded if k[0] < seq]:
+                del self._encoded[old]
+            while len(self._encoded) >= self.encode_cache:
+                self._encoded.pop(next(iter(self._encoded)))
+            self._encoded[key] = data
+            self.encodes += 1
+            return data
+
+    def frames(self, level=None, max_width=None, adaptive=True, timeout=1.0):
+        """
+        Generator of JPEG bytes for one client, newest frame first.
+
+        Args:
+            level (int, optional): Best quality step the client wants (index into
+                ``QUALITY_LEVELS``, 0 is best; see ``level_for_quality``); defaults to the top step
+            max_width (int, optional): Never send frames wider than this
+            adaptive (bool): Step quality down while the client drops frames
+            timeout (float): Wake-up interval used to notice a closed stream
+        """
+        level = min(max(int(level or 0), 0), len(QUALITY_LEVELS) - 1)
+        client = _Client(level=level, max_width=max_width, adaptive=adaptive)
+        with self._cond:
+            self._clients.add(client)
+        try:
+            while True:
+                with self._cond:
+                    while self._seq == client.last_seq and not self._closed:
+                        self._cond.wait(timeout)
+                    if self._seq == client.last_seq:
+                        return
+                    seq, frame = self._seq, self._frame
+                skipped = seq - client.last_seq - 1 if client.last_seq else 0
+                if skipped:
+                    self.metrics.count('stream_frames_dropped', skipped)
+                client.last_seq = seq
+                data = self._encode(seq, frame, client)
+                client.delivered(skipped)
+                if data is not None:
+                    yield data
+        finally:
+            with self._cond:
+                self._clients.discard(client)
+                if not self._clients:
+                    self._last_client_left = time.time()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'frames': self._seq,
+                'clients': len(self._clients),
+                'encodes': self.encodes,
+                'client_levels': sorted(c.level for c in self._clients),
+            }
@@ -0,0 +1,51 @@
+class InferenceCadence:
+    """
+    Decides on which frames each YOLO pass actually runs.
+
+    The base model and the violation model each run every Nth frame. In
+    adaptive mode the interval shrinks while tracks move fast, so quick
+    vehicles are re-detected before the carried-forward boxes drift.
+    """
+
+    def __init__(self, base_interval=3, violation_interval=6, adaptive=True, fast_speed=0.01):
+        """
+        Args:
+            base_interval (int): Run the base model (tracking) every N frames
+            violation_interval (int): Run the violation model every N frames
+            adaptive (bool): Shorten intervals when tracks move fast
+            fast_speed (float): Track speed (fraction of the frame diagonal per
+                frame) at which the configured interval is used as-is; faster
+                tracks shrink it proportionally
+        """
+        self.intervals = {
+            'base': max(1, int(base_interval)),
+            'violation': max(1, int(violation_interval)),
+        }
+        self.adaptive = adaptive
+        self.fast_speed = float(fast_speed)
+
+        # Fastest track speed seen at the last base keyframe
+        self.speed = 0.0
+        self._last_run = {'base': None, 'violation': None}
+
+    def reset(self):
+        self.speed = 0.0
+        self._last_run = {'base': None, 'violation': None}
+
+    def interval(self, kind):
+        """Current interval for ``'base'`` or ``'violation'``."""
+        n = self.intervals[kind]
+        if self.adaptive and n > 1 and self.speed > self.fast_speed:
+            n = max(1, int(n * self.fast_speed / self.speed))
+        return n
+
+    def due(self, kind, frame_count):
+        """True if ``kind`` should run on this frame; records it as a keyframe."""
+        last = self._last_run[kind]
+        if last is None or frame_count - last >= self.interval(kind) or frame_count < last:
+            self._last_run[kind] = frame_count
+            return True
+        return False
+
+    def update_speed(self, speed):
+        self.speed = float(speed)
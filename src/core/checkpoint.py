@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+
+def input_fingerprint(path):
+    """Identity of a job's input: path, size and mtime (a replaced file no longer matches)."""
+    stat = os.stat(path)
+    return {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+class JobCheckpoint:
+    """
+    Periodic, atomic JSON checkpoint of one long-running job.
+
+    The job decides what goes in (frame position, ledger state, output
+    offsets, ...); this class only handles the cadence and makes sure a
+    crash mid-write never leaves a half-written file behind (write to a
+    temp file, then ``os.replace``).
+    """
+
+    def __init__(self, path, interval=900):
+        """
+        Args:
+            path (str): Checkpoint file
+            interval (int): Frames between checkpoints
+        """
+        self.path = path
+        self.interval = max(1, int(interval))
+        self._last_frame = None
+
+    def load(self, input_path=None):
+        """
+        Last saved state, or None when there is nothing (valid) to resume from.
+
+        With ``input_path`` the state is only returned if it was saved for that
+        same file (its 'input' matches ``input_fingerprint(input_path)``).
+        """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable checkpoint {self.path}: {e}")
+            return None
+        if input_path is not None and state.get('input') != input_fingerprint(input_path):
+            print(f"⚠️ Ignoring checkpoint {self.path}: saved for a different version of {input_path}")
+            return None
+        self._last_frame = state.get('frame')
+        return state
+
+    def due(self, frame):
+        """True once ``interval`` frames have passed since the last save."""
+        if self._last_frame is None:
+            self._last_frame = frame
+            return False
+        return frame - self._last_frame >= self.interval
+
+    def save(self, state):
+        """Atomically write ``state`` (must contain 'frame')."""
+        state = dict(state, saved=time.time())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._last_frame = state['frame']
+
+    def remove(self):
+        """Job finished: nothing to resume any more."""
+        for path in (self.path, self.path + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+        self._last_frame = None
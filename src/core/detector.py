@@ -1,74 +1,391 @@
 import cv2
-import numpy as np
 import os
-from ultralytics import YOLO
+import time
 from collections import defaultdict
+from core.enhancer import NightEnhancer
+from core.evidence import EvidenceRecorder
+from core.frame_source import FrameSource, GrowingFileSource
+from core.live_source import LiveFrameSource
+from core.cadence import InferenceCadence
+from core.geometry import as_boxes, assign_by_center, iou_matrix, overlap_counts, pad_box
+from core.metrics import METRICS
+from core.model_pool import ModelPool, TrackerState
+from core.latency import LatencyController
+from core.motion import MotionGate
+from core.pipeline import VideoPipeline
+from core.renderer import FrameRenderer
 
 class TrafficDetector:
-    def __init__(self, model_path=None):
-        # --- Model 1: Base Model for Vehicles (Context & Signal Jump via Line Cross) ---
-        self.base_model_path = '../../yolov8n.pt'
-        if not os.path.exists(self.base_model_path):
-             # Try downloading or find in weights? usually it downloads automatically
-             print("⚠️ yolov8n.pt not found locally, YOLO will attempt download.")
-        
-        print(f"🔄 Loading Base Model (Vehicles): {self.base_model_path}")
-        self.base_model = YOLO(self.base_model_path)
-        
-        # --- Model 2: Custom Model for Violations (No Helmet, etc) ---
-        # Priority 1: Check for latest trained model in runs/
-        latest_model = r'../../runs/detect/traffic_night_model5/weights/best.pt'
-        fallback_model = r'../../models/weights/custom_traffic.pt'
-
-        if model_path is None:
-            if os.path.exists(latest_model):
-                print(f"✅ Found latest trained model at: {latest_model}")
-                model_path = latest_model
-            elif os.path.exists(fallback_model):
-                print(f"⚠️ Latest model not found, falling back to: {fallback_model}")
-                model_path = fallback_model
-            else:
-                 print("⚠️ No custom model found! Violation detection might utilize base model only.")
-                 model_path = None
-        
-        self.violation_model = None
-        if model_path:
-            print(f"🔄 Loading Custom Model (Violations): {os.path.abspath(model_path)}")
-            try:
-                self.violation_model = YOLO(model_path)
-                print(f"📋 Custom Model Classes: {self.violation_model.names}")
-            except Exception as e:
-                print(f"❌ Failed to load custom model: {e}")
+    # Low confidence on the custom model to catch missed detections
+    VIOLATION_CONF = 0.10
+    # Track centers kept per track id, and frames after which an unseen track is forgotten
+    HISTORY_LENGTH = 30
+    TRACK_TTL = 150
+    # Crop mode: padding around a motorcycle box (left, top, right, bottom, as fractions
+    # of its size). Generous on top so the riders' heads are inside the crop.
+    CROP_PADDING = (0.25, 1.2, 0.25, 0.1)
+    MIN_CROP_SIZE = 8
+
+    def __init__(self, model_path=None, pool=None, cadence=None, metrics=None, motion_gate=None,
+                 crop_violations=False):
+        """
+        Args:
+            model_path (str, optional): Custom violation weights (ignored when ``pool`` is given)
+            pool (ModelPool, optional): Shared models. Without one, a private pool is loaded.
+            cadence (InferenceCadence, optional): Run the models only on keyframes and
+                carry boxes/labels forward in between. None runs both on every frame.
+            metrics (MetricsRegistry, optional): Where stage timings and counters go
+                (defaults to the process-wide registry served on /metrics)
+            motion_gate (MotionGate, optional): Skip inference on static frames and limit
+                the violation model to the region of motion
+            crop_violations (bool): Run the violation model on padded crops around
+                tracked motorcycles instead of the whole frame
+        """
+        # Models are loaded once per pool; a detector is just a lightweight session on top
+        if pool is None:
+            pool = ModelPool(model_path=model_path)
+        self.pool = pool
+        self.base_model = pool.base_model
+        self.violation_model = pool.violation_model
+
+        # Per-session tracker state (swapped into the shared base model on each track call)
+        self.tracker_state = TrackerState()
 
         # Tracking logic
         self.track_history = defaultdict(lambda: [])
+
+        # Cadence control: last keyframe results and per-track velocity (px/frame)
+        self.cadence = cadence
+        # Violation interval the caller configured; the latency controller only ever raises it
+        self._violation_interval = cadence.intervals['violation'] if cadence is not None else 1
+        self._velocities = {}
+        self._last_base = None
+        self._last_custom = None
+
+        # Motion gating: results are stored per frame by check_motion() and consumed
+        # by analyze_frame(), which may run on another pipeline thread
+        self.motion_gate = motion_gate
+        self._motion_results = {}
+
+        # Crop mode: violation model only sees the motorcycles the base model tracked
+        self.crop_violations = crop_violations
+
+        # Violation-model MicroBatcher (see set_batching)
+        self.batcher = None
+        self._batch_settings = None
+
+        # Inference input size (None = ultralytics default) and optional latency-budget controller
+        self.imgsz = None
+        self.controller = None
+
+        # Active VideoPipeline when process_video runs in pipelined mode
+        self.pipeline = None
+        # Frame source of the current process_video run (LiveFrameSource.stats() for cameras)
+        self.source = None
+
+        # Stage timings / counters; model time is tracked so 'annotate' excludes it
+        self.metrics = metrics if metrics is not None else METRICS
+        self._model_seconds = 0.0
+
+        # Night enhancement engine (LUTs, CLAHE and buffers reused across frames)
+        self.enhancer = NightEnhancer()
+
+        # Drawing lives apart from detection so headless runs skip it
+        self.renderer = FrameRenderer()
+
+        # EvidenceRecorder of the current process_video run (when evidence_dir is given)
+        self.evidence = None
+
+        # Resume bookkeeping: last frame handed to the consumer, highest track id so far,
+        # and the offset added to tracker ids after a resume (fresh tracker, no id reuse)
+        self.frame_position = 0
+        self.max_track_id = 0
+        self.track_id_offset = 0
+        # After a resume: tracks at the checkpoint, matched once against the first
+        # new detections so vehicles crossing the resume point keep their old id
+        self._resume_tracks = None
+        self._id_remap = {}
+        # [(track_id, bbox)] of every tracked object in the most recently analysed frame
+        self.last_tracks = []
+        # track_snapshot() of the frame at frame_position (what checkpoint_state() saves)
+        self._position_tracks = (0, [])
         
     def enhance_night_frame(self, frame):
-        """Enhance low-light frames using Gamma Correction and CLAHE"""
-        # 1. Gamma Correction (Brighten)
-        gamma = 1.5
-        inv_gamma = 1.0 / gamma
-        table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-        bright_frame = cv2.LUT(frame, table)
-        
-        # 2. CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        lab = cv2.cvtColor(bright_frame, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-        cl = clahe.apply(l)
-        limg = cv2.merge((cl, a, b))
-        final_frame = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
-        return final_frame
-
-    def detect_violations(self, frame, enhanced_frame, frame_count):
+        """Enhance low-light frames using Gamma Correction and CLAHE.
+
+        Gamma is chosen from the scene luminance and bright frames are returned
+        unchanged. The result is a pooled buffer owned by ``self.enhancer``.
+        """
+        with self.metrics.stage('enhance'):
+            return self.enhancer.enhance(frame)
+
+    def _model_kwargs(self):
+        """Extra YOLO call arguments driven by the active quality settings."""
+        return {'imgsz': self.imgsz} if self.imgsz else {}
+
+    def _refresh_batcher(self):
+        if self._batch_settings is not None:
+            batch_size, max_delay = self._batch_settings
+            self.batcher = self.pool.get_batcher(batch_size, max_delay, conf=self.VIOLATION_CONF,
+                                                 **self._model_kwargs())
+
+    def set_batching(self, batch_size, max_delay=0.03):
+        """
+        Send violation-model calls through the pool's shared ``MicroBatcher``
+        (``batch_size`` <= 1 turns it off). Only worth it when frames reach the
+        batcher concurrently: pipelined runs, or several streams on one pool.
+        """
+        self.batcher = None
+        self._batch_settings = None
+        if batch_size > 1 and self.violation_model:
+            self._batch_settings = (batch_size, max_delay)
+            self._refresh_batcher()
+
+    def apply_settings(self, settings):
+        """
+        Apply quality settings (as produced by ``LatencyController``).
+
+        Args:
+            settings (dict): Any of 'imgsz', 'violation_interval', 'enhance'. The violation
+                interval never drops below the configured cadence, so level 0 keeps it.
+        """
+        if 'imgsz' in settings and settings['imgsz'] != self.imgsz:
+            self.imgsz = settings['imgsz']
+            self._refresh_batcher()
+        if 'violation_interval' in settings:
+            if self.cadence is None:
+                self.cadence = InferenceCadence(base_interval=1, violation_interval=1, adaptive=False)
+            # Never run the violation model more often than the caller's cadence asked for
+            self.cadence.intervals['violation'] = max(self._violation_interval,
+                                                      int(settings['violation_interval']))
+        if 'enhance' in settings:
+            self.enhancer.set_quality(settings['enhance'])
+
+    def record_frame_cost(self, seconds, frame_count):
+        """Feed one frame's processing time to the latency controller (if any)."""
+        if self.controller is None:
+            return
+        settings = self.controller.record(seconds * 1000.0, frame_count)
+        if settings is not None:
+            print(f"🎚️ Frame {frame_count}: latency {self.controller.latency_ms:.1f} ms "
+                  f"(budget {self.controller.target_ms:.1f} ms) -> {settings}")
+            self.apply_settings(settings)
+
+    def check_motion(self, frame, frame_count):
+        """
+        Run the motion gate on the next frame (frames must arrive in order).
+        Must be called before ``violation_due`` / ``analyze_frame`` for that frame.
+        """
+        if self.motion_gate is None:
+            return None
+        with self.metrics.stage('motion'):
+            result = self.motion_gate.update(frame)
+        self._motion_results[frame_count] = result
+        if not result.active:
+            self.metrics.count('motion_skipped')
+        return result
+
+    def _is_static(self, frame_count):
+        motion = self._motion_results.get(frame_count)
+        return motion is not None and not motion.active
+
+    def violation_due(self, frame_count):
+        """True if the violation model should run on this frame (see ``cadence``)."""
+        if not self.violation_model or self._is_static(frame_count):
+            return False
+        return self.cadence is None or self.cadence.due('violation', frame_count)
+
+    def violation_input(self, enhanced_frame, frame_count):
+        """
+        Part of the enhanced frame the violation model should see and its (x, y) offset:
+        the region of motion when motion gating is on, else the whole frame.
+        """
+        motion = self._motion_results.get(frame_count)
+        if motion is None or motion.region is None:
+            return enhanced_frame, (0, 0)
+        x1, y1, x2, y2 = motion.region
+        return enhanced_frame[y1:y2, x1:x2], (x1, y1)
+
+    def _run_base_model(self, frame, frame_count):
+        """
+        Base model tracking -> list of {'label', 'bbox', 'track_id'}.
+        Between cadence keyframes the last detections are carried forward.
+        """
+        if self._is_static(frame_count):
+            # Nothing moved: keep the last boxes where they are, tracker untouched
+            return self._hold(self._last_base)
+        if self.cadence is not None and not self.cadence.due('base', frame_count):
+            return self._propagate(self._last_base, frame_count)
+
+        # Conf 0.25 to catch more people
+        with self.metrics.stage('track') as timed:
+            base_results = self.pool.track(frame, self.tracker_state, conf=0.25, **self._model_kwargs())
+        self._model_seconds += timed.elapsed
+
+        detections = []
+        for result in base_results:
+            boxes = result.boxes
+            for box in boxes:
+                x1, y1, x2, y2 = map(int, box.xyxy[0])
+                cls = int(box.cls[0])
+                detections.append({
+                    "label": self.base_model.names[cls],
+                    "bbox": [x1, y1, x2, y2],
+                    "track_id": int(box.id[0]) + self.track_id_offset if box.id is not None else None
+                })
+
+        if self._resume_tracks is not None:
+            self._match_resume_tracks(detections)
+        if self._id_remap:
+            for det in detections:
+                det["track_id"] = self._id_remap.get(det["track_id"], det["track_id"])
+
+        self._remember_tracks(detections, frame_count, frame.shape)
+        return detections
+
+    def _run_violation_model(self, enhanced_frame, frame_count, custom_results=None):
+        """Custom model -> list of {'label', 'bbox'} in full-frame coordinates"""
+        model_input, (off_x, off_y) = self.violation_input(enhanced_frame, frame_count)
+        # LOWER CONFIDENCE significantly to catch missed detections
+        if custom_results is None:
+            with self.metrics.stage('predict') as timed:
+                if self.batcher is not None:
+                    custom_results = self.batcher.predict(model_input)
+                else:
+                    custom_results = self.pool.predict(model_input, conf=self.VIOLATION_CONF,
+                                                       **self._model_kwargs())
+            self._model_seconds += timed.elapsed
+
+        detections = []
+        for result in custom_results:
+            boxes = result.boxes
+            for box in boxes:
+                vx1, vy1, vx2, vy2 = map(int, box.xyxy[0])
+                cls = int(box.cls[0])
+                detections.append({
+                    "label": self.violation_model.names[cls],
+                    "bbox": [vx1 + off_x, vy1 + off_y, vx2 + off_x, vy2 + off_y]
+                })
+        return detections
+
+    def _run_violation_crops(self, enhanced_frame, motorcycles):
+        """
+        Custom model on a batch of padded crops around tracked motorcycles.
+        Detections are mapped back to frame coordinates and owned by the bike's track id.
+        """
+        height, width = enhanced_frame.shape[:2]
+        crops, owners = [], []
+        for bike in motorcycles:
+            x1, y1, x2, y2 = pad_box(bike['box'], self.CROP_PADDING, width, height)
+            if x2 - x1 < self.MIN_CROP_SIZE or y2 - y1 < self.MIN_CROP_SIZE:
+                continue
+            crops.append(enhanced_frame[y1:y2, x1:x2])
+            owners.append((bike['id'], x1, y1))
+        if not crops:
+            return []
+        self.metrics.count('violation_crops', len(crops))
+
+        with self.metrics.stage('predict') as timed:
+            if self.batcher is not None:
+                # Crops share batches with other frames / streams on the pool's batcher
+                pending = [self.batcher.submit(crop) for crop in crops]
+                crop_results = [future.result()[0] for future in pending]
+            else:
+                crop_results = self.pool.predict(crops, conf=self.VIOLATION_CONF, **self._model_kwargs())
+        self._model_seconds += timed.elapsed
+
+        detections = []
+        for result, (track_id, off_x, off_y) in zip(crop_results, owners):
+            for box in result.boxes:
+                vx1, vy1, vx2, vy2 = map(int, box.xyxy[0])
+                cls = int(box.cls[0])
+                detections.append({
+                    "label": self.violation_model.names[cls],
+                    "bbox": [vx1 + off_x, vy1 + off_y, vx2 + off_x, vy2 + off_y],
+                    "track_id": track_id
+                })
+        return detections
+
+    def _remember_tracks(self, detections, frame_count, shape):
+        """Update track history / velocities at a base-model keyframe."""
+        height, width = shape[:2]
+        diagonal = (height * height + width * width) ** 0.5
+        max_speed = 0.0
+
+        for det in detections:
+            track_id = det["track_id"]
+            if track_id is None:
+                continue
+            x1, y1, x2, y2 = det["bbox"]
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            history = self.track_history[track_id]
+            if history and frame_count > history[-1][0]:
+                last_frame, px, py = history[-1]
+                vx = (cx - px) / (frame_count - last_frame)
+                vy = (cy - py) / (frame_count - last_frame)
+                self._velocities[track_id] = (vx, vy)
+                max_speed = max(max_speed, (vx * vx + vy * vy) ** 0.5 / diagonal)
+            history.append((frame_count, cx, cy))
+            if track_id > self.max_track_id:
+                self.max_track_id = track_id
+            if len(history) > self.HISTORY_LENGTH:
+                del history[0]
+
+        # Forget tracks that have not been seen for a while
+        stale = [tid for tid, history in self.track_history.items()
+                 if not history or frame_count - history[-1][0] > self.TRACK_TTL]
+        for tid in stale:
+            del self.track_history[tid]
+            self._velocities.pop(tid, None)
+
+        if self.cadence is not None:
+            self.cadence.update_speed(max_speed)
+        self._last_base = (frame_count, detections)
+
+    @staticmethod
+    def _hold(keyframe):
+        """Keyframe detections unchanged (copies, so callers can annotate them)."""
+        if keyframe is None:
+            return []
+        return [dict(det) for det in keyframe[1]]
+
+    def _propagate(self, keyframe, frame_count):
+        """Shift keyframe detections along their track velocity to ``frame_count``."""
+        if keyframe is None:
+            return []
+        key_count, detections = keyframe
+        elapsed = frame_count - key_count
+        propagated = []
+        for det in detections:
+            vx, vy = self._velocities.get(det["track_id"], (0.0, 0.0))
+            dx, dy = int(round(vx * elapsed)), int(round(vy * elapsed))
+            x1, y1, x2, y2 = det["bbox"]
+            propagated.append(dict(det, bbox=[x1 + dx, y1 + dy, x2 + dx, y2 + dy]))
+        return propagated
+
+    def analyze_frame(self, frame, enhanced_frame, frame_count, custom_results=None, run_violation=None):
         """
         Dual-Model Logic with Association:
         1. Base Model -> Detect & Track Vehicles (Get IDs) & People
         2. Signal Jump -> Only enabled when simulated Traffic Light is RED
         3. Triple Riding -> Heuristic (Person count on bike) + Custom Model
+
+        Nothing is copied or drawn here; ``render()`` turns the result into an
+        annotated frame when one is actually needed.
+
+        ``custom_results`` lets the caller pass violation-model results computed
+        ahead of time (e.g. by a MicroBatcher) instead of predicting here.
+        ``run_violation`` forces the violation-model cadence decision for this
+        frame (the caller already asked ``violation_due``); None decides here.
+
+        Returns:
+            dict: 'frame_count', 'stop_line_y', 'is_red_light', 'vehicles'
+            ({'label', 'bbox', 'track_id', 'signal_jump'}), 'triple_riding' and
+            'model_violations' (what the renderer draws) and 'violations' (all of them)
         """
+        start = time.perf_counter()
+        self._model_seconds = 0.0
         violations = []
-        annotated_frame = frame.copy()
         
         height, width = frame.shape[:2]
         stop_line_y = int(height * 0.75)
@@ -77,187 +394,400 @@ class TrafficDetector:
         # Toggle every 150 frames (approx 5 seconds at 30fps)
         is_red_light = (frame_count % 300) < 150
         
-        # Draw Stop Line (Always Red for visibility)
-        cv2.line(annotated_frame, (0, stop_line_y), (width, stop_line_y), (0, 0, 255), 3)
-        
-        # VISUALS REMOVED AS REQUESTED
-        # light_color = (0, 0, 255) if is_red_light else (0, 255, 0)
-        # status_text = "RED LIGHT" if is_red_light else "GREEN LIGHT"
-        # cv2.circle(annotated_frame, (50, 50), 30, (0,0,0), -1)
-        # cv2.circle(annotated_frame, (50, 50), 25, light_color, -1)
-        # cv2.putText(annotated_frame, status_text, (90, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, light_color, 2)
-        
         # Storage
         tracked_vehicles = {}
+        vehicles = [] # {'label', 'bbox', 'track_id', 'signal_jump'}
         persons = [] # [x1, y1, x2, y2]
         motorcycles = [] # {'id': id, 'box': [x1,y1,x2,y2]}
+        triple_riding = []
+        model_violations = []
 
         # --- 1. Run Base Model (Vehicles & People) ---
-        # Conf 0.25 to catch more people
-        base_results = self.base_model.track(frame, persist=True, verbose=False, conf=0.25)
-        
-        for result in base_results:
-            boxes = result.boxes
-            for box in boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                cls = int(box.cls[0])
-                label = self.base_model.names[cls]
-                track_id = int(box.id[0]) if box.id is not None else None
+        base_detections = self._run_base_model(frame, frame_count)
+        self.metrics.count('detections', len(base_detections), model='base')
+        self.last_tracks = [(det["track_id"], det["bbox"]) for det in base_detections
+                            if det["track_id"] is not None]
+        for det in base_detections:
+            x1, y1, x2, y2 = det["bbox"]
+            label = det["label"]
+            track_id = det["track_id"]
+            
+            # Collect People
+            if label == 'person':
+                persons.append([x1, y1, x2, y2])
+            
+            # Check for vehicles
+            if label in ['car', 'motorcycle', 'bus', 'truck', 'auto']:
+                if track_id is not None:
+                    tracked_vehicles[track_id] = [x1, y1, x2, y2]
                 
-                # Collect People (Visual Debugging)
-                if label == 'person':
-                    persons.append([x1, y1, x2, y2])
-                    # Draw Person in Yellow to debug (Optional: Remove if too cluttered, but keeping for now)
-                    # cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (0, 255, 255), 1)
+                if label == 'motorcycle':
+                     motorcycles.append({'id': track_id, 'box': [x1, y1, x2, y2]})
+
+                center_y = (y1 + y2) / 2
+                signal_jump = False
                 
-                # Check for vehicles
-                if label in ['car', 'motorcycle', 'bus', 'truck', 'auto']:
-                    if track_id is not None:
-                        tracked_vehicles[track_id] = [x1, y1, x2, y2]
-                    
-                    if label == 'motorcycle':
-                         motorcycles.append({'id': track_id, 'box': [x1, y1, x2, y2]})
+                # --- SIGNAL JUMP LOGIC ---
+                # Only check if Light is RED (Internal Simulation)
+                if is_red_light:
+                    if center_y > stop_line_y:
+                         if track_id is not None:
+                            violations.append({
+                                "type": "Signal Jump",
+                                "object": label,
+                                "bbox": [x1, y1, x2, y2],
+                                "track_id": track_id
+                            })
+                            signal_jump = True
 
-                    center_y = (y1 + y2) / 2
-                    color = (0, 255, 0) # Green default
-                    
-                    # --- SIGNAL JUMP LOGIC ---
-                    # Only check if Light is RED (Internal Simulation)
-                    if is_red_light:
-                        if center_y > stop_line_y:
-                             if track_id is not None:
-                                violations.append({
-                                    "type": "Signal Jump",
-                                    "object": label,
-                                    "bbox": [x1, y1, x2, y2],
-                                    "track_id": track_id
-                                })
-                                color = (0, 0, 255)
-                                cv2.putText(annotated_frame, "SIGNAL JUMP", (x1, y1-10), 
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-                    
-                    cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-                    label_text = f"{label} {track_id}" if track_id else label
-                    cv2.putText(annotated_frame, label_text, (x1, y1-30), 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+                vehicles.append({"label": label, "bbox": [x1, y1, x2, y2],
+                                 "track_id": track_id, "signal_jump": signal_jump})
 
         # --- TRIPLE RIDING HEURISTIC ---
-        for bike in motorcycles:
-            bx1, by1, bx2, by2 = bike['box']
-            bike_id = bike['id']
-            
-            # Count people overlapping with the bike
-            rider_count = 0
-            for p in persons:
-                px1, py1, px2, py2 = p
-                
-                # Check Intersection
-                ix1 = max(bx1, px1)
-                iy1 = max(by1, py1)
-                ix2 = min(bx2, px2)
-                iy2 = min(by2, py2)
-                
-                if ix2 > ix1 and iy2 > iy1:
-                    # If there is ANY intersection, we count it as a rider candidate
-                    # (Simple overlap check is often better for riders who sit ON top of the bike box)
-                    rider_count += 1
-            
-            # --- DEBUG VISUALIZATION REMOVED ---
-            # cv2.putText(annotated_frame, f"Riders:{rider_count}", (bx1, by1-15), 
-            #             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+        # Count people overlapping with each bike in one bikes x persons matrix.
+        # If there is ANY intersection, we count it as a rider candidate
+        # (Simple overlap check is often better for riders who sit ON top of the bike box)
+        rider_counts = overlap_counts(as_boxes([bike['box'] for bike in motorcycles]), as_boxes(persons))
 
+        for bike, rider_count in zip(motorcycles, rider_counts):
             # Heuristic Trigger: > 2 riders
             if rider_count > 2:
-                 violations.append({
+                 violation_obj = {
                     "type": "Triple Riding",
                     "object": "motorcycle",
                     "bbox": bike['box'],
-                    "track_id": bike_id
-                 })
-                 cv2.rectangle(annotated_frame, (bx1, by1), (bx2, by2), (255, 0, 0), 3)
-                 cv2.putText(annotated_frame, f"TRIPLE RIDING", (bx1, by1-60), 
-                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+                    "track_id": bike['id']
+                 }
+                 violations.append(violation_obj)
+                 triple_riding.append(violation_obj)
 
         # --- 2. Run Custom Model (Violations) ---
         if self.violation_model:
             # Custom Model Logic
-            # LOWER CONFIDENCE significantly to catch missed detections
-            custom_results = self.violation_model.predict(enhanced_frame, conf=0.10, verbose=False) 
+            if run_violation is None:
+                run_violation = self.violation_due(frame_count)
+
+            if run_violation and self.crop_violations:
+                # Crop results already belong to their motorcycle's track
+                custom_detections = self._run_violation_crops(enhanced_frame, motorcycles)
+                self.metrics.count('detections', len(custom_detections), model='violation')
+                self._last_custom = (frame_count, custom_detections)
+            elif run_violation:
+                custom_detections = self._run_violation_model(enhanced_frame, frame_count, custom_results)
+                self.metrics.count('detections', len(custom_detections), model='violation')
+
+                # Find ID: vehicle whose box contains the detection center (best IoU wins)
+                vehicle_ids = list(tracked_vehicles.keys())
+                matches = assign_by_center(as_boxes([det["bbox"] for det in custom_detections]),
+                                           as_boxes(list(tracked_vehicles.values())))
+                for det, match in zip(custom_detections, matches):
+                    det["track_id"] = vehicle_ids[match] if match >= 0 else None
+                self._last_custom = (frame_count, custom_detections)
+            elif self._is_static(frame_count):
+                custom_detections = self._hold(self._last_custom)
+            else:
+                # Between keyframes: carry labels forward with their owning track
+                custom_detections = self._propagate(self._last_custom, frame_count)
             
-            for result in custom_results:
-                boxes = result.boxes
-                for box in boxes:
-                    vx1, vy1, vx2, vy2 = map(int, box.xyxy[0])
-                    cls = int(box.cls[0])
-                    label = self.violation_model.names[cls]
-                    
-                    # Find ID
-                    v_center_x = (vx1 + vx2) / 2
-                    v_center_y = (vy1 + vy2) / 2
-                    assigned_id = None
-                    for vid, vbox in tracked_vehicles.items():
-                        if vbox[0] < v_center_x < vbox[2] and vbox[1] < v_center_y < vbox[3]:
-                            assigned_id = vid
-                            break
+            for det in custom_detections:
+                vx1, vy1, vx2, vy2 = det["bbox"]
+                label = det["label"]
+                assigned_id = det["track_id"]
+                v_center_x = (vx1 + vx2) / 2
+                v_center_y = (vy1 + vy2) / 2
                     
-                    violation_obj = {
-                        "object": label,
-                        "bbox": [vx1, vy1, vx2, vy2],
-                        "track_id": assigned_id if assigned_id else f"loc_{int(v_center_x)}_{int(v_center_y)}"
-                    }
-
-                    is_violation = False
-                    label_lower = label.lower()
-                    
-                    if 'helmet' in label_lower: 
-                        violation_obj["type"] = "No Helmet"
-                        is_violation = True
-                    elif 'triple' in label_lower:
-                        violation_obj["type"] = "Triple Riding" 
-                        is_violation = True
-                    elif 'jump' in label_lower or 'signal' in label_lower:
-                        # Custom model signal jump usually better than logic
-                        violation_obj["type"] = "Signal Jump"
-                        is_violation = True
-
-                    if is_violation:
-                        cv2.rectangle(annotated_frame, (vx1, vy1), (vx2, vy2), (0, 0, 255), 3)
-                        t_id_str = f"ID:{assigned_id}" if assigned_id else ""
-                        cv2.putText(annotated_frame, f"{violation_obj['type']} {t_id_str}", (vx1, vy1-10), 
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                        violations.append(violation_obj)
-
-        return annotated_frame, violations
-
-    def process_video(self, input_path, output_path):
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
+                violation_obj = {
+                    "object": label,
+                    "bbox": [vx1, vy1, vx2, vy2],
+                    "track_id": assigned_id if assigned_id else f"loc_{int(v_center_x)}_{int(v_center_y)}"
+                }
+
+                is_violation = False
+                label_lower = label.lower()
+                
+                if 'helmet' in label_lower: 
+                    violation_obj["type"] = "No Helmet"
+                    is_violation = True
+                elif 'triple' in label_lower:
+                    violation_obj["type"] = "Triple Riding" 
+                    is_violation = True
+                elif 'jump' in label_lower or 'signal' in label_lower:
+                    # Custom model signal jump usually better than logic
+                    violation_obj["type"] = "Signal Jump"
+                    is_violation = True
+
+                if is_violation:
+                    violations.append(violation_obj)
+                    model_violations.append(violation_obj)
+
+        self._motion_results.pop(frame_count, None)
+
+        # Everything except the model calls: association logic
+        self.metrics.observe('annotate', time.perf_counter() - start - self._model_seconds)
+        self.metrics.count('frames')
+        for v in violations:
+            self.metrics.count('violations', type=v.get('type', 'unknown'))
+
+        return {
+            'frame_count': frame_count,
+            'stop_line_y': stop_line_y,
+            'is_red_light': is_red_light,
+            'vehicles': vehicles,
+            'triple_riding': triple_riding,
+            'model_violations': model_violations,
+            'violations': violations,
+        }
+
+    def render(self, frame, analysis):
+        """Annotated copy of ``frame`` for an ``analyze_frame`` result."""
+        with self.metrics.stage('render'):
+            return self.renderer.render(frame, analysis)
+
+    def detect_violations(self, frame, enhanced_frame, frame_count, custom_results=None, run_violation=None,
+                          render=True):
+        """
+        ``analyze_frame`` plus (optionally) rendering.
+
+        Returns:
+            tuple: ``(annotated_frame, violations)``; ``annotated_frame`` is None
+            when ``render`` is False (headless: no copy, no drawing)
+        """
+        analysis = self.analyze_frame(frame, enhanced_frame, frame_count,
+                                      custom_results=custom_results, run_violation=run_violation)
+        annotated_frame = self.render(frame, analysis) if render else None
+        return annotated_frame, analysis['violations']
+
+    def process_frame(self, frame, frame_count, render=True):
+        """
+        One decoded frame through motion check, enhancement and detection
+        (what ``process_video`` does per frame; also used by ``CameraScheduler``).
+
+        Returns:
+            tuple: ``(processed_frame or None, violations)``
+        """
+        start = time.perf_counter()
+        self.check_motion(frame, frame_count)
+        # The enhanced frame only feeds the violation model
+        run_violation = self.violation_due(frame_count)
+        enhanced = self.enhance_night_frame(frame) if run_violation else None
+        processed_frame, violations = self.detect_violations(frame, enhanced, frame_count,
+                                                             run_violation=run_violation, render=render)
+        self.record_frame_cost(time.perf_counter() - start, frame_count)
+        return processed_frame, violations
+
+    def _match_resume_tracks(self, detections, min_iou=0.5):
+        """Map new track ids onto the checkpoint's tracks by box overlap (once, greedy)."""
+        old_ids = [tid for tid, _ in self._resume_tracks]
+        new = [det for det in detections if det["track_id"] is not None]
+        if old_ids and new:
+            ious = iou_matrix(as_boxes([det["bbox"] for det in new]),
+                              as_boxes([box for _, box in self._resume_tracks]))
+            used = set()
+            for index in ious.max(axis=1).argsort()[::-1]:
+                best = int(ious[index].argmax())
+                if ious[index, best] < min_iou or best in used:
+                    continue
+                used.add(best)
+                self._id_remap[new[index]["track_id"]] = old_ids[best]
+        self._resume_tracks = None
+
+    def track_snapshot(self):
+        """
+        ``(max_track_id, last_tracks)`` right after a frame was analysed. The pipeline
+        carries it along with the frame, since its detect stage runs ahead of the consumer.
+        """
+        return self.max_track_id, self.last_tracks
+
+    def checkpoint_state(self):
+        """
+        Detector part of a job checkpoint; pass it back as ``process_video(resume=...)``.
+        'frame' is the last frame already yielded to the consumer; the track ids and
+        boxes are those of that same frame.
+        """
+        max_track_id, tracks = self._position_tracks
+        return {
+            'frame': self.frame_position,
+            'max_track_id': max_track_id,
+            'tracks': [[track_id, bbox] for track_id, bbox in tracks],
+            'evidence': self.evidence.state() if self.evidence is not None else None,
+        }
+
+    def process_video(self, input_path, output_path, pipelined=False, queue_size=8,
+                      batch_size=1, max_batch_delay=0.03, shared_batcher=False,
+                      latency_target_ms=None, target_fps=None,
+                      motion_gating=False, crop_violations=None, render=True,
+                      evidence_dir=None, pre_roll=3.0, post_roll=2.0, resume=None, end_frame=None,
+                      frame_stride=1, decode_width=None, live=False, follow=None):
+        """
+        Process a video file frame by frame.
+
+        Args:
+            input_path (str): Video to read
+            output_path (str): Where the annotated video is written (None: no video)
+            pipelined (bool): Run decode, enhancement, detection and writing on
+                separate threads connected by bounded queues (see ``VideoPipeline``)
+            queue_size (int): Capacity of each stage queue in pipelined mode
+            batch_size (int): When > 1, violation-model calls go through the pool's
+                shared MicroBatcher (batched across frames in pipelined mode and
+                across concurrent streams). Ignored unless frames can actually reach
+                it concurrently (``pipelined`` or ``shared_batcher``): a lone sequential
+                stream would only wait ``max_batch_delay`` for a batch of one.
+            max_batch_delay (float): Seconds a frame may wait for its batch to fill
+            shared_batcher (bool): Other streams submit to the same pool's batcher
+                concurrently, so batching pays off even in sequential mode
+            latency_target_ms (float): Per-frame budget; a LatencyController then adapts
+                imgsz, violation cadence and enhancement quality (see ``self.controller``)
+            target_fps (float): Same as ``latency_target_ms`` expressed as FPS
+            motion_gating (bool): Skip enhancement and inference on static frames and run
+                the violation model on the region of motion only (see ``MotionGate``)
+            crop_violations (bool): Run the violation model on crops around tracked
+                motorcycles (None keeps ``self.crop_violations``)
+            render (bool): Yield annotated frames. With ``render=False`` and no
+                ``output_path`` the run is headless: nothing is copied or drawn.
+            evidence_dir (str): Write short annotated clips and snapshots around each
+                new violation here (see ``EvidenceRecorder``); clips are listed in
+                ``self.evidence.clips``
+            pre_roll (float): Seconds of evidence before a violation
+            post_roll (float): Seconds of evidence after the last violation in a clip
+            resume (dict): A ``checkpoint_state()`` from an interrupted run. Decoding
+                seeks straight to the frame after it; new track ids continue above the
+                old ones so first-seen dedup stays valid across the resume point.
+            end_frame (int): Stop after this frame (1-based, inclusive); None reads to the end
+            frame_stride (int): Analyse every n-th frame only; skipped frames are grabbed
+                but never decoded to BGR (see ``FrameSource``). Frame numbers stay those
+                of the source video.
+            decode_width (int): Downscale wider frames once right after decoding; every
+                stage (and the output video) then works at this width
+            live (bool): ``input_path`` is a live camera (URL, device index, or a file
+                played back as one): read through a ``LiveFrameSource`` that always hands
+                out the newest frame and reconnects after drops. Frame numbers count
+                captured frames; ``resume``, ``end_frame``, ``frame_stride`` and
+                ``decode_width`` do not apply.
+            follow (callable): ``input_path`` is still being written (an upload in
+                progress); read it as it grows until ``follow()`` returns True
+                (see ``GrowingFileSource``)
+
+        Yields:
+            tuple: ``(processed_frame, violations)`` for every frame, in order
+            (``processed_frame`` is None when nothing is rendered)
+        """
+        if live:
+            resume = None
+            start_frame = 0
+            source = LiveFrameSource(input_path, metrics=self.metrics)
+            # Anything queued between stages is latency on a live stream
+            queue_size = 1
+        else:
+            start_frame = int(resume.get('frame', 0)) if resume else 0
+            if frame_stride > 1:
+                # Stay on the frame grid of a run from the start (resume, segments)
+                start_frame = -(-start_frame // frame_stride) * frame_stride
+            # Seeking to start_frame costs about one GOP, independent of how far into the video it is
+            if follow is not None:
+                source = GrowingFileSource(input_path, follow, stride=frame_stride, start_frame=start_frame,
+                                           end_frame=end_frame, max_width=decode_width)
+            else:
+                source = FrameSource(input_path, stride=frame_stride, start_frame=start_frame,
+                                     end_frame=end_frame, max_width=decode_width)
+        self.source = source
+        if not source.isOpened():
              print(f"ERROR: Could not open video file: {input_path}")
+             source.release()
              return
 
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        width, height = source.width, source.height
+        fps = source.output_fps
         
         # Guard
         if width == 0 or height == 0:
-             cap.release()
+             source.release()
              return
 
-        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        self.track_id_offset = 0
+        if resume:
+            self.max_track_id = self.track_id_offset = int(resume.get('max_track_id', 0))
+            self._resume_tracks = resume.get('tracks') or None
+            self._id_remap = {}
+            print(f"⏩ {os.path.basename(input_path)}: starting at frame {start_frame}")
+        self.frame_position = start_frame
+        self._position_tracks = (self.max_track_id, (resume.get('tracks') or []) if resume else [])
+
+        out = None
+        if output_path is not None:
+            out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        self.evidence = None
+        if evidence_dir is not None:
+            prefix = os.path.splitext(source.name if live else os.path.basename(input_path))[0]
+            # Frame numbers stay those of the source, so they advance by the stride per clip frame
+            self.evidence = EvidenceRecorder(evidence_dir, fps=fps, pre_roll=pre_roll, post_roll=post_roll,
+                                             prefix=prefix, frame_step=1 if live else frame_stride,
+                                             metrics=self.metrics)
+            if resume and resume.get('evidence'):
+                self.evidence.load_state(resume['evidence'])
+        # Frames are only drawn when someone sees them: the consumer, the video file or evidence clips
+        render = render or out is not None or self.evidence is not None
+
+        if batch_size > 1 and not (pipelined or shared_batcher):
+            print(f"⚠️ batch_size={batch_size} ignored: nothing to batch with in sequential mode "
+                  f"(use pipelined=True or shared_batcher=True)")
+            batch_size = 1
+        self.set_batching(batch_size, max_batch_delay)
+
+        if latency_target_ms or target_fps:
+            self.controller = LatencyController(target_ms=latency_target_ms, target_fps=target_fps)
+            self.apply_settings(self.controller.settings)
+
+        if crop_violations is not None:
+            self.crop_violations = crop_violations
+        if motion_gating and self.motion_gate is None:
+            self.motion_gate = MotionGate()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+            self._motion_results.clear()
+
+        if pipelined:
+            # Stage queue depths are readable from self.pipeline.queue_depths() (and /sessions)
+            self.pipeline = VideoPipeline(self, queue_size=queue_size, render=render)
+            try:
+                for frame_count, processed_frame, violations, tracks in self.pipeline.run(source, out):
+                    if self.evidence is not None:
+                        self.evidence.add(processed_frame, frame_count, violations)
+                    self.frame_position = frame_count
+                    self._position_tracks = tracks
+                    if live:
+                        source.done(frame_count - 1)
+                    yield processed_frame, violations
+            finally:
+                source.release()
+                if out is not None:
+                    out.release()
+                if self.evidence is not None:
+                    self.evidence.close()
+            return
         
-        frame_count = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            enhanced = self.enhance_night_frame(frame)
-            processed_frame, violations = self.detect_violations(frame, enhanced, frame_count)
+        try:
+            while True:
+                with self.metrics.stage('decode'):
+                    item = source.read()
+                if item is None:
+                    break
             
-            out.write(processed_frame)
-            yield processed_frame, violations
+                frame_count = item[0] + 1
+                processed_frame, violations = self.process_frame(item[1], frame_count, render=render)
             
-        cap.release()
-        out.release()
\ No newline at end of file
+                if out is not None:
+                    with self.metrics.stage('write'):
+                        out.write(processed_frame)
+                if self.evidence is not None:
+                    self.evidence.add(processed_frame, frame_count, violations)
+                self.frame_position = frame_count
+                self._position_tracks = self.track_snapshot()
+                if live:
+                    source.done(frame_count - 1)
+                yield processed_frame, violations
+        finally:
+            source.release()
+            if out is not None:
+                out.release()
+            if self.evidence is not None:
+                self.evidence.close()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import math
+
+import cv2
+import numpy as np
+
+
+class NightEnhancer:
+    """
+    Reusable low-light enhancer (Gamma Correction + CLAHE).
+
+    Keeps the gamma lookup tables, the CLAHE object and the intermediate
+    LAB / luminance buffers alive between frames so the per-frame cost is
+    just the OpenCV kernels. Gamma is picked from the measured scene
+    luminance and frames that are already bright enough are passed through.
+    """
+
+    # Quality levels: gamma + CLAHE, gamma LUT only, pass-through
+    QUALITIES = ('full', 'gamma', 'off')
+
+    def __init__(self, clip_limit=3.0, tile_grid_size=(8, 8), target_luma=110.0,
+                 skip_luma=125.0, min_gamma=1.0, max_gamma=2.5, gamma_step=0.1,
+                 sample_stride=8, pool_size=2, quality='full'):
+        """
+        Args:
+            clip_limit (float): CLAHE clip limit
+            tile_grid_size (tuple): CLAHE tile grid
+            target_luma (float): Mean luminance (0-255) the gamma curve aims for
+            skip_luma (float): Frames at or above this mean luminance are returned as-is
+            min_gamma (float): Lower gamma clamp
+            max_gamma (float): Upper gamma clamp
+            gamma_step (float): Gamma is quantized to this step so LUTs can be cached
+            sample_stride (int): Pixel stride used when measuring luminance
+            pool_size (int): Number of output buffers rotated between calls. A
+                returned frame stays valid for ``pool_size - 1`` further calls.
+            quality (str): 'full' (gamma + CLAHE), 'gamma' (LUT only) or 'off'
+        """
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tuple(tile_grid_size)
+        self.target_luma = float(target_luma)
+        self.skip_luma = float(skip_luma)
+        self.min_gamma = float(min_gamma)
+        self.max_gamma = float(max_gamma)
+        self.gamma_step = float(gamma_step)
+        self.sample_stride = max(1, int(sample_stride))
+        self.pool_size = max(1, int(pool_size))
+        self.set_quality(quality)
+
+        self._clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=self.tile_grid_size)
+        self._luts = {}
+
+        # Buffers are (re)allocated lazily when the frame shape changes
+        self._shape = None
+        self._lab = None
+        self._l = None
+        self._l_eq = None
+        self._outputs = []
+        self._next_output = 0
+
+        # Last decision, handy for debugging / metrics
+        self.last_luma = None
+        self.last_gamma = None
+
+    def set_clip_limit(self, clip_limit):
+        """Change the CLAHE clip limit without rebuilding the CLAHE object."""
+        self.clip_limit = clip_limit
+        self._clahe.setClipLimit(clip_limit)
+
+    def set_quality(self, quality):
+        if quality not in self.QUALITIES:
+            raise ValueError(f"Invalid quality. Must be one of: {self.QUALITIES}")
+        self.quality = quality
+
+    def set_pool_size(self, pool_size):
+        """Change how many output buffers rotate; buffers are reallocated on the next frame."""
+        self.pool_size = max(1, int(pool_size))
+        self._shape = None
+
+    def measure_luma(self, frame):
+        """Approximate mean luminance (0-255) from a strided sample of the frame."""
+        s = self.sample_stride
+        b, g, r, _ = cv2.mean(frame[::s, ::s])
+        return 0.114 * b + 0.587 * g + 0.299 * r
+
+    def choose_gamma(self, luma):
+        """Gamma that maps the measured mean luminance close to ``target_luma``."""
+        if luma <= 1.0:
+            return self.max_gamma
+        if luma >= self.target_luma:
+            return self.min_gamma
+        # out = 255 * (in / 255) ** (1 / gamma)  ->  solve for out == target
+        gamma = math.log(luma / 255.0) / math.log(self.target_luma / 255.0)
+        gamma = min(self.max_gamma, max(self.min_gamma, gamma))
+        return round(round(gamma / self.gamma_step) * self.gamma_step, 4)
+
+    def lut_for(self, gamma):
+        """Cached 256-entry gamma lookup table."""
+        lut = self._luts.get(gamma)
+        if lut is None:
+            inv_gamma = 1.0 / gamma
+            lut = (np.power(np.arange(256, dtype=np.float32) / 255.0, inv_gamma) * 255).astype(np.uint8)
+            self._luts[gamma] = lut
+        return lut
+
+    def _ensure_buffers(self, shape):
+        if shape == self._shape:
+            return
+        h, w = shape[:2]
+        self._shape = shape
+        self._lab = np.empty((h, w, 3), dtype=np.uint8)
+        self._l = np.empty((h, w), dtype=np.uint8)
+        self._l_eq = np.empty((h, w), dtype=np.uint8)
+        self._outputs = [np.empty((h, w, 3), dtype=np.uint8) for _ in range(self.pool_size)]
+        self._next_output = 0
+
+    def enhance(self, frame, gamma=None):
+        """
+        Enhance a BGR frame.
+
+        Args:
+            frame (np.ndarray): BGR uint8 frame
+            gamma (float, optional): Force a gamma instead of measuring the scene
+
+        Returns:
+            np.ndarray: Enhanced frame (a pooled buffer), or ``frame`` itself
+            when the scene is already bright enough.
+        """
+        if self.quality == 'off':
+            return frame
+        if gamma is None:
+            luma = self.measure_luma(frame)
+            self.last_luma = luma
+            if luma >= self.skip_luma:
+                self.last_gamma = None
+                return frame
+            gamma = self.choose_gamma(luma)
+        self.last_gamma = gamma
+
+        self._ensure_buffers(frame.shape)
+        out = self._outputs[self._next_output]
+        self._next_output = (self._next_output + 1) % self.pool_size
+
+        # 1. Gamma Correction (Brighten) - written straight into the output buffer
+        cv2.LUT(frame, self.lut_for(gamma), dst=out)
+        if self.quality == 'gamma':
+            return out
+
+        # 2. CLAHE on the L channel only
+        cv2.cvtColor(out, cv2.COLOR_BGR2LAB, dst=self._lab)
+        cv2.extractChannel(self._lab, 0, dst=self._l)
+        self._clahe.apply(self._l, dst=self._l_eq)
+        cv2.insertChannel(self._l_eq, self._lab, 0)
+        cv2.cvtColor(self._lab, cv2.COLOR_LAB2BGR, dst=out)
+        return out
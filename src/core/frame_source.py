@@ -0,0 +1,308 @@
+import os
+import time
+
+import cv2
+
+
+class FrameSource:
+    """
+    Frame reader shared by detection, frame extraction, calibration and benchmarks.
+
+    - Frames that are not wanted (``stride`` > 1) are skipped with ``grab()``
+      only, so they are never converted to BGR.
+    - For large strides it seeks by timestamp instead of grabbing through
+      every frame in between.
+    - With ``max_width`` frames are downscaled once, right after decoding,
+      so every consumer works on the small frame.
+
+    Iterating yields ``(index, frame)`` with the 0-based index of the frame
+    in the source video.
+    """
+
+    # Strides at least this large seek instead of grabbing through the gap
+    SEEK_STRIDE = 90
+
+    def __init__(self, path, stride=1, start_frame=0, end_frame=None, max_width=None,
+                 seek_stride=SEEK_STRIDE):
+        """
+        Args:
+            path (str): Video file (or anything ``cv2.VideoCapture`` opens)
+            stride (int): Return every ``stride``-th frame
+            start_frame (int): First frame index to return (0-based)
+            end_frame (int): Stop before this frame index (None: read to the end)
+            max_width (int): Downscale wider frames to this width (aspect ratio kept)
+            seek_stride (int): Minimum stride for which seeking is used
+        """
+        self.path = path
+        self.stride = max(1, int(stride))
+        self.end_frame = end_frame
+        self.seek_stride = seek_stride
+
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.source_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+        self._size = None
+        if max_width and self.source_width > max_width:
+            scale = max_width / float(self.source_width)
+            self._size = (int(max_width), max(1, int(round(self.source_height * scale))))
+
+        # Stats
+        self.grabbed = 0
+        self.retrieved = 0
+        self.seeks = 0
+
+        self.position = 0   # index of the next frame the decoder will return
+        if start_frame:
+            self.seek(start_frame)
+
+    # --- Properties ---
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    @property
+    def width(self):
+        """Width of the returned frames."""
+        return self._size[0] if self._size else self.source_width
+
+    @property
+    def height(self):
+        """Height of the returned frames."""
+        return self._size[1] if self._size else self.source_height
+
+    @property
+    def output_fps(self):
+        """Frame rate of the returned frame sequence."""
+        return self.fps / self.stride if self.fps else 0.0
+
+    # --- Positioning ---
+    def seek(self, index):
+        """Jump to frame ``index`` (by timestamp when the fps is known)."""
+        if self.fps:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, index * 1000.0 / self.fps)
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.position = index
+        self.seeks += 1
+
+    def seek_time(self, seconds):
+        """Jump to the frame shown at ``seconds``."""
+        self.seek(int(round(seconds * self.fps)) if self.fps else 0)
+
+    # --- Reading ---
+    def read(self):
+        """
+        Next wanted frame.
+
+        Returns:
+            tuple: ``(index, frame)``, or None at the end of the video
+        """
+        if self.end_frame is not None and self.position >= self.end_frame:
+            return None
+        if not self.cap.grab():
+            return None
+        self.grabbed += 1
+        index = self.position
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return None
+        self.retrieved += 1
+        if self._size is not None:
+            frame = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+
+        # Skip ahead to the next wanted frame without decoding what lies in between
+        self.position = index + 1
+        if self.stride > 1:
+            target = index + self.stride
+            if self.stride >= self.seek_stride:
+                self.seek(target)
+            else:
+                while self.position < target:
+                    if not self.cap.grab():
+                        break
+                    self.grabbed += 1
+                    self.position += 1
+        return index, frame
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def interrupt(self):
+        """Wake a blocked ``read()`` (file reads never block, so nothing to do)."""
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class GrowingFileSource:
+    """
+    ``FrameSource`` over a file that is still being written (e.g. an upload in progress).
+
+    Frames are read as far as the file goes; at its current end the reader
+    waits for the file to grow, reopens it and seeks back to the next frame.
+    While the file is growing a frame is only handed out once the frame
+    after it decoded too, so a half-written frame at the tail is never
+    analysed. Containers that need their index at the end of the file (plain
+    MP4 without faststart) cannot be opened before the upload finishes;
+    streamable ones (MKV, AVI, MPEG-TS, faststart/fragmented MP4) start
+    right away.
+    """
+
+    def __init__(self, path, is_complete, stride=1, start_frame=0, end_frame=None, max_width=None,
+                 poll_interval=0.5, min_growth=256 * 1024, idle_timeout=600.0):
+        """
+        Args:
+            path (str): Video file being written
+            is_complete (callable): Returns True once the file will not grow any more
+            stride, start_frame, end_frame, max_width: As for ``FrameSource``
+            poll_interval (float): Seconds between checks for new data
+            min_growth (int): Bytes the file must grow by before it is reopened
+            idle_timeout (float): Give up when the file has not grown for this long
+        """
+        self.path = path
+        self.is_complete = is_complete
+        self.stride = max(1, int(stride))
+        self.end_frame = end_frame
+        self.max_width = max_width
+        self.poll_interval = poll_interval
+        self.min_growth = min_growth
+        self.idle_timeout = idle_timeout
+
+        self._next = start_frame      # index of the next frame to read
+        self._pending = None          # frame held back until its successor decodes
+        self._source = None
+        self._opened_size = 0
+        self._interrupted = False
+
+        # Stats
+        self.reopens = 0
+        self.waited = 0.0
+
+        self._open(wait=True)
+
+    # --- Properties (those of the current FrameSource) ---
+    def isOpened(self):
+        return self._source is not None and self._source.isOpened() and self._source.width > 0
+
+    @property
+    def fps(self):
+        return self._source.fps if self._source is not None else 0.0
+
+    @property
+    def output_fps(self):
+        return self._source.output_fps if self._source is not None else 0.0
+
+    @property
+    def width(self):
+        return self._source.width if self._source is not None else 0
+
+    @property
+    def height(self):
+        return self._source.height if self._source is not None else 0
+
+    # --- Following the file ---
+    def _size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _open(self, wait):
+        """(Re)open at the next frame; with ``wait`` keep trying until the file can be decoded."""
+        while not self._interrupted:
+            complete = self.is_complete()
+            size = self._size()
+            if self._source is not None:
+                self._source.release()
+            self._source = FrameSource(self.path, stride=self.stride, start_frame=self._next,
+                                       end_frame=self.end_frame, max_width=self.max_width)
+            self._opened_size = size
+            if self.isOpened() or complete or not wait:
+                return
+            # Not enough of the file yet to read its header
+            if not self._wait_for_growth():
+                return
+
+    def _wait_for_growth(self):
+        """Block until the file grew by ``min_growth`` or is complete; False on timeout / interrupt."""
+        start = time.monotonic()
+        while not self._interrupted:
+            if self.is_complete() or self._size() - self._opened_size >= self.min_growth:
+                self.waited += time.monotonic() - start
+                return True
+            if time.monotonic() - start > self.idle_timeout:
+                print(f"⚠️ {os.path.basename(self.path)} stopped growing, giving up")
+                return False
+            time.sleep(self.poll_interval)
+        return False
+
+    # --- Reading ---
+    def read(self):
+        """
+        Next frame that is fully written.
+
+        Returns:
+            tuple: ``(index, frame)``, or None at the end of the (complete) file
+        """
+        while not self._interrupted:
+            complete = self.is_complete()
+            item = self._source.read() if self._source is not None else None
+            if item is not None:
+                self._next = self._source.position
+                if complete:
+                    pending, self._pending = self._pending, None
+                    if pending is None:
+                        return item
+                    self._pending = item
+                    return pending
+                # Hand out the previous frame now that a later one decoded
+                pending, self._pending = self._pending, item
+                if pending is not None:
+                    return pending
+                continue
+            if complete and self._opened_size == self._size():
+                # Read to the end of the finished file
+                pending, self._pending = self._pending, None
+                return pending
+            if not complete and not self._wait_for_growth():
+                break
+            # The held frame was decoded from the shorter file: read it again from the new data
+            if self._pending is not None:
+                self._next = self._pending[0]
+                self._pending = None
+            self.reopens += 1
+            self._open(wait=False)
+        return None
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def interrupt(self):
+        """Stop waiting for the file to grow."""
+        self._interrupted = True
+
+    def release(self):
+        self._interrupted = True
+        if self._source is not None:
+            self._source.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
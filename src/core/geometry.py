@@ -0,0 +1,81 @@
+import numpy as np
+
+
+def as_boxes(boxes):
+    """List of [x1, y1, x2, y2] -> float (N, 4) array (empty-safe)."""
+    return np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def intersection_matrix(a, b):
+    """(N, M) intersection areas between two box arrays."""
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    return np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+
+
+def overlap_counts(a, b):
+    """For every box in ``a``, how many boxes in ``b`` it intersects (any positive area)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros(len(a), dtype=np.int64)
+    return (intersection_matrix(a, b) > 0).sum(axis=1)
+
+
+def iou_matrix(a, b):
+    """(N, M) intersection-over-union between two box arrays."""
+    inter = intersection_matrix(a, b)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def assign_by_center(boxes, targets):
+    """
+    Match each box to the target box that strictly contains its center.
+
+    When several targets contain the center, the one with the highest IoU
+    wins (first target on ties), instead of simply the first hit.
+
+    Returns:
+        np.ndarray: (N,) index into ``targets`` or -1 when nothing contains the center
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(targets) == 0:
+        return np.full(len(boxes), -1, dtype=np.int64)
+
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    inside = ((targets[None, :, 0] < cx[:, None]) & (cx[:, None] < targets[None, :, 2]) &
+              (targets[None, :, 1] < cy[:, None]) & (cy[:, None] < targets[None, :, 3]))
+
+    # -1 for non-containing targets so any containing one (IoU >= 0) beats them
+    score = np.where(inside, iou_matrix(boxes, targets), -1.0)
+    best = score.argmax(axis=1)
+    return np.where(inside.any(axis=1), best, -1)
+
+
+def pad_box(box, padding, width, height):
+    """
+    Grow ``box`` by per-side fractions of its size and clip it to the frame.
+
+    Args:
+        box (list): [x1, y1, x2, y2]
+        padding (tuple): (left, top, right, bottom) as fractions of box width/height
+        width (int): Frame width
+        height (int): Frame height
+
+    Returns:
+        list: Integer [x1, y1, x2, y2] inside the frame
+    """
+    x1, y1, x2, y2 = box
+    w, h = x2 - x1, y2 - y1
+    left, top, right, bottom = padding
+    return [
+        max(0, int(x1 - w * left)),
+        max(0, int(y1 - h * top)),
+        min(width, int(x2 + w * right)),
+        min(height, int(y2 + h * bottom)),
+    ]
@@ -0,0 +1,110 @@
+import time
+from collections import deque
+
+
+# Quality ladder, best first. Each step trades a little accuracy for speed.
+DEFAULT_LEVELS = (
+    {'imgsz': 640, 'violation_interval': 1, 'enhance': 'full'},
+    {'imgsz': 640, 'violation_interval': 2, 'enhance': 'full'},
+    {'imgsz': 512, 'violation_interval': 2, 'enhance': 'full'},
+    {'imgsz': 512, 'violation_interval': 3, 'enhance': 'gamma'},
+    {'imgsz': 416, 'violation_interval': 4, 'enhance': 'gamma'},
+    {'imgsz': 320, 'violation_interval': 6, 'enhance': 'gamma'},
+)
+
+
+class LatencyController:
+    """
+    Keeps per-frame processing time within a budget.
+
+    Fed with the measured cost of every frame, it steps down the quality
+    ladder (inference ``imgsz``, violation-model cadence, enhancement
+    quality) while the smoothed latency is over budget, and steps back up
+    once there is clear headroom. Every change is logged with the latency
+    that caused it, so quality drops can be explained after the fact.
+    """
+
+    def __init__(self, target_ms=None, target_fps=None, levels=DEFAULT_LEVELS, smoothing=0.1,
+                 degrade_patience=10, recover_patience=60, recover_ratio=0.7, history=100):
+        """
+        Args:
+            target_ms (float): Per-frame latency budget
+            target_fps (float): Alternative to ``target_ms`` (budget = 1000 / fps)
+            levels (sequence): Quality ladder, best first
+            smoothing (float): EWMA factor for the measured latency
+            degrade_patience (int): Frames over budget before stepping down
+            recover_patience (int): Frames under ``recover_ratio`` * budget before stepping up
+            recover_ratio (float): Headroom needed before restoring quality
+            history (int): Number of setting changes remembered
+        """
+        if target_ms is None and target_fps is None:
+            raise ValueError("LatencyController needs target_ms or target_fps")
+        self.target_ms = float(target_ms) if target_ms is not None else 1000.0 / float(target_fps)
+        self.levels = list(levels)
+        self.smoothing = smoothing
+        self.degrade_patience = degrade_patience
+        self.recover_patience = recover_patience
+        self.recover_ratio = recover_ratio
+
+        self.level = 0
+        self.latency_ms = None
+        self._over = 0
+        self._under = 0
+        self.changes = deque(maxlen=history)
+
+    @property
+    def settings(self):
+        """Currently active settings."""
+        return self.levels[self.level]
+
+    def record(self, frame_ms, frame_count=None):
+        """
+        Feed one frame's processing time.
+
+        Returns:
+            dict or None: New settings when the level changed, else None
+        """
+        if self.latency_ms is None:
+            self.latency_ms = frame_ms
+        else:
+            self.latency_ms += self.smoothing * (frame_ms - self.latency_ms)
+
+        if self.latency_ms > self.target_ms:
+            self._over += 1
+            self._under = 0
+        elif self.latency_ms < self.target_ms * self.recover_ratio:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        new_level = self.level
+        if self._over >= self.degrade_patience and self.level < len(self.levels) - 1:
+            new_level = self.level + 1
+        elif self._under >= self.recover_patience and self.level > 0:
+            new_level = self.level - 1
+        if new_level == self.level:
+            return None
+
+        self.changes.append({
+            'time': time.time(),
+            'frame': frame_count,
+            'from_level': self.level,
+            'to_level': new_level,
+            'latency_ms': round(self.latency_ms, 2),
+            'target_ms': round(self.target_ms, 2),
+            'settings': dict(self.levels[new_level]),
+        })
+        self.level = new_level
+        self._over = self._under = 0
+        return self.settings
+
+    def state(self):
+        """Active settings plus the recent change log (for /sessions or logs)."""
+        return {
+            'target_ms': round(self.target_ms, 2),
+            'latency_ms': round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            'level': self.level,
+            'settings': dict(self.settings),
+            'changes': list(self.changes),
+        }
@@ -0,0 +1,163 @@
+import threading
+
+
+class LocationDedup:
+    """
+    First-seen filter for violations the detector could not tie to a track.
+
+    Those carry a ``loc_<x>_<y>`` id built from the box center, which changes
+    every frame as the box moves. A detection of the same type within
+    ``radius`` pixels of one seen in the last ``ttl`` frames is treated as the
+    same event; only the recent ones are remembered, so memory stays flat.
+    """
+
+    PREFIX = 'loc_'
+
+    def __init__(self, radius=80, ttl=30):
+        self.radius = radius
+        self.ttl = ttl
+        self._recent = []   # [type, cx, cy, last frame]
+        self._frame = 0
+
+    @classmethod
+    def applies(cls, violation):
+        track_id = violation.get('track_id')
+        return isinstance(track_id, str) and track_id.startswith(cls.PREFIX)
+
+    def next_frame(self):
+        """Advance one frame and forget events not seen for ``ttl`` frames."""
+        self._frame += 1
+        self._recent = [event for event in self._recent if self._frame - event[3] <= self.ttl]
+
+    def is_new(self, violation):
+        x1, y1, x2, y2 = violation['bbox']
+        cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+        v_type = violation.get('type')
+        for event in self._recent:
+            if event[0] == v_type and (event[1] - cx) ** 2 + (event[2] - cy) ** 2 <= self.radius ** 2:
+                event[1:] = [cx, cy, self._frame]
+                return False
+        self._recent.append([v_type, cx, cy, self._frame])
+        return True
+
+
+class ViolationLedger:
+    """
+    Running violation statistics for one video / stream.
+
+    Each (track_id, violation type) is counted once, using set membership
+    instead of rebuilding key lists every frame. Combination counters
+    ('multiple', 'traffic_helmet') are bumped the moment a vehicle first
+    qualifies, so the per-frame cost only depends on the violations in that
+    frame, not on how long the video has been running.
+
+    Violations without a track (``loc_...`` ids) are deduplicated by
+    position instead (see ``LocationDedup``) and never join a vehicle's
+    combination counters.
+    """
+
+    STAT_KEYS = ('signal', 'helmet', 'triple', 'traffic_helmet', 'multiple')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    @staticmethod
+    def category(v_type):
+        """Map a violation type ('Signal Jump', 'No Helmet', ...) to its stats key."""
+        if 'Signal' in v_type:
+            return 'signal'
+        if 'Helmet' in v_type:
+            return 'helmet'
+        if 'Triple' in v_type:
+            return 'triple'
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._seen = set()              # {(track_id, v_type)}
+            self._vehicle_types = {}        # track_id -> {v_type}
+            self._vehicle_categories = {}   # track_id -> {stats key}
+            self._stats = {key: 0 for key in self.STAT_KEYS}
+            self._locations = LocationDedup()
+            self.frames = 0
+
+    def record(self, violations):
+        """
+        Add one frame's violations.
+
+        Returns:
+            list: Violations seen for the first time (new (track_id, type) pairs)
+        """
+        new = []
+        with self._lock:
+            self.frames += 1
+            self._locations.next_frame()
+            for v in violations:
+                v_type = v.get('type', '')
+                track_id = v.get('track_id')
+                if track_id is None:
+                    continue
+
+                if LocationDedup.applies(v):
+                    if self._locations.is_new(v):
+                        new.append(v)
+                        category = self.category(v_type)
+                        if category is not None:
+                            self._stats[category] += 1
+                    continue
+
+                key = (track_id, v_type)
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                new.append(v)
+
+                types = self._vehicle_types.setdefault(track_id, set())
+                types.add(v_type)
+                # Vehicle just got its second distinct violation type
+                if len(types) == 2:
+                    self._stats['multiple'] += 1
+
+                category = self.category(v_type)
+                if category is None:
+                    continue
+                categories = self._vehicle_categories.setdefault(track_id, set())
+                if category in categories:
+                    continue
+                categories.add(category)
+                self._stats[category] += 1
+                # Vehicle just completed the signal + helmet combination
+                if category in ('signal', 'helmet') and {'signal', 'helmet'} <= categories:
+                    self._stats['traffic_helmet'] += 1
+        return new
+
+    def snapshot(self):
+        """Copy of the current counters (cheap, safe to call from another thread)."""
+        with self._lock:
+            return dict(self._stats)
+
+    def state(self):
+        """JSON-serializable copy of everything needed to resume counting (see ``load_state``)."""
+        with self._lock:
+            return {
+                'seen': [list(key) for key in self._seen],
+                'vehicle_types': [[tid, sorted(types)] for tid, types in self._vehicle_types.items()],
+                'vehicle_categories': [[tid, sorted(cats)] for tid, cats in self._vehicle_categories.items()],
+                'stats': dict(self._stats),
+                'frames': self.frames,
+            }
+
+    def load_state(self, state):
+        """Restore a ``state()`` snapshot, so first-seen dedup continues where it stopped."""
+        with self._lock:
+            self._seen = {tuple(key) for key in state.get('seen', [])}
+            self._vehicle_types = {tid: set(types) for tid, types in state.get('vehicle_types', [])}
+            self._vehicle_categories = {tid: set(cats) for tid, cats in state.get('vehicle_categories', [])}
+            self._stats = {key: state.get('stats', {}).get(key, 0) for key in self.STAT_KEYS}
+            self.frames = state.get('frames', 0)
+
+    def vehicle_violations(self):
+        """Copy of track_id -> set of violation types."""
+        with self._lock:
+            return {tid: set(types) for tid, types in self._vehicle_types.items()}
@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+
+import cv2
+
+from core.metrics import METRICS
+
+
+class LiveFrameSource:
+    """
+    Latest-frame-wins reader for live cameras (RTSP / HTTP URLs, device indexes).
+
+    A reader thread decodes the stream continuously and keeps only the newest
+    frame, so a slow consumer never builds up a backlog: it always gets the
+    most recent frame and the ones it was too slow for are counted as dropped.
+    When the stream fails, the reader reconnects with exponential backoff.
+
+    A local video file works as a camera stand-in: it is played back at its
+    own frame rate and looped, so the whole live path can be exercised
+    without a camera.
+
+    Same reading interface as ``FrameSource``: ``read()`` / iteration yield
+    ``(index, frame)`` where ``index`` counts every frame captured since the
+    start (gaps are dropped frames).
+    """
+
+    def __init__(self, url, name=None, reconnect_delay=0.5, max_reconnect_delay=10.0, max_retries=None,
+                 loop=None, realtime=None, open_timeout=10.0, metrics=None):
+        """
+        Args:
+            url (str): Stream URL, device index ("0") or local video file
+            name (str): Label for logs and metric counters (defaults to the URL's base name)
+            reconnect_delay (float): First wait (seconds) before reconnecting; doubles per failure
+            max_reconnect_delay (float): Upper bound of the backoff
+            max_retries (int): Consecutive failed reconnects before giving up (None: never)
+            loop (bool): Restart a local file at its end (default: True for files)
+            realtime (bool): Pace reading to the source fps (default: True for files)
+            open_timeout (float): Seconds to wait for the first frame
+            metrics (MetricsRegistry, optional): Where latency timings and drop counters go
+        """
+        self.url = int(url) if isinstance(url, str) and url.isdigit() else url
+        self.name = name or (os.path.basename(str(url).rstrip('/')) or str(url))
+        self.is_file = isinstance(self.url, str) and os.path.isfile(self.url)
+        self.loop = self.is_file if loop is None else loop
+        self.realtime = self.is_file if realtime is None else realtime
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_retries = max_retries
+        self.metrics = metrics if metrics is not None else METRICS
+
+        self.fps = 0.0
+        self.width = 0
+        self.height = 0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = None
+        self._seq = -1           # index of the newest frame
+        self._last_read = -1     # index of the last frame handed out
+        self._captured = {}      # index -> capture time of frames handed out and not done yet
+        self._stop = threading.Event()
+        self._interrupted = False
+        self._ended = False
+
+        # Stats
+        self.connected = False
+        self.captured = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.reconnects = 0
+        self.last_latency = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq >= 0 or self._ended, timeout=open_timeout)
+
+    # --- Properties ---
+    def isOpened(self):
+        return self._seq >= 0 and not self._ended
+
+    @property
+    def output_fps(self):
+        return self.fps
+
+    # --- Reader thread ---
+    def _open(self):
+        cap = cv2.VideoCapture(self.url)
+        if cap.isOpened():
+            self.fps = cap.get(cv2.CAP_PROP_FPS) or self.fps or 25.0
+            self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or self.width
+            self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or self.height
+        return cap
+
+    def _run(self):
+        cap = None
+        delay = self.reconnect_delay
+        failures = 0
+        next_due = None
+        try:
+            while not self._stop.is_set():
+                if cap is None:
+                    cap = self._open()
+                    if not cap.isOpened():
+                        cap.release()
+                        cap = None
+                        failures += 1
+                        if self.max_retries is not None and failures > self.max_retries:
+                            print(f"❌ {self.name}: giving up after {failures} failed connects")
+                            return
+                        self._stop.wait(delay)
+                        delay = min(delay * 2, self.max_reconnect_delay)
+                        continue
+                    self.connected = True
+                    next_due = time.monotonic()
+
+                ok, frame = cap.read()
+                if not ok:
+                    if self.is_file and self.loop and self.captured:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    cap.release()
+                    cap = None
+                    self.connected = False
+                    if self.is_file:
+                        return
+                    self.reconnects += 1
+                    self.metrics.count('live_reconnects', camera=self.name)
+                    print(f"⚠️ {self.name}: stream lost, reconnecting in {delay:.1f}s")
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    continue
+
+                delay = self.reconnect_delay
+                failures = 0
+                if self.realtime:
+                    # Behave like a camera: frames arrive at the source rate, not as fast as we decode
+                    next_due += 1.0 / self.fps
+                    wait = next_due - time.monotonic()
+                    if wait > 0:
+                        self._stop.wait(wait)
+                    else:
+                        next_due = time.monotonic()
+
+                with self._cond:
+                    self._frame = frame
+                    self._frame_time = time.monotonic()
+                    self._seq += 1
+                    self.captured += 1
+                    if not self.width:
+                        self.height, self.width = frame.shape[:2]
+                    self._cond.notify_all()
+        finally:
+            if cap is not None:
+                cap.release()
+            self.connected = False
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    # --- Reading ---
+    def read(self):
+        """
+        Newest frame not handed out yet; blocks until one arrives.
+
+        Returns:
+            tuple: ``(index, frame)``, or None once the stream ended or was released
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._last_read or self._ended or self._interrupted)
+            return self._take()
+
+    def latest(self):
+        """Like ``read()`` but never blocks: None when no new frame arrived since the last call."""
+        with self._cond:
+            return self._take()
+
+    @property
+    def ended(self):
+        """True once the stream ended (or was given up) and every frame was handed out."""
+        return self._ended and self._seq <= self._last_read
+
+    def _take(self):
+        # Caller holds self._cond
+        if self._interrupted or self._seq <= self._last_read:
+            return None
+        index, frame = self._seq, self._frame
+        skipped = index - self._last_read - 1
+        self._last_read = index
+        self.delivered += 1
+        self._captured[index] = self._frame_time
+        # Consumers that never call done() must not grow this
+        while len(self._captured) > 64:
+            self._captured.pop(next(iter(self._captured)))
+        if skipped:
+            self.dropped += skipped
+            self.metrics.count('live_frames_dropped', skipped, camera=self.name)
+        return index, frame
+
+    def done(self, index):
+        """Frame ``index`` has been fully processed: record its capture-to-result latency."""
+        with self._cond:
+            captured = self._captured.pop(index, None)
+        if captured is not None:
+            self.last_latency = time.monotonic() - captured
+            self.metrics.observe('live_latency', self.last_latency)
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def interrupt(self):
+        """Wake a blocked ``read()``; it and later calls return None."""
+        with self._cond:
+            self._interrupted = True
+            self._cond.notify_all()
+
+    def release(self):
+        self._stop.set()
+        self.interrupt()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def stats(self):
+        return {
+            'source': self.name,
+            'connected': self.connected,
+            'fps': round(self.fps, 2),
+            'frames_captured': self.captured,
+            'frames_delivered': self.delivered,
+            'frames_dropped': self.dropped,
+            'reconnects': self.reconnects,
+            'latency_ms': round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+        }
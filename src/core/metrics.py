@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+
+
+class MetricsCallback:
+    """
+    Interface for feeding pipeline timings into an external profiler.
+
+    Subclass and override what you need, then register the instance with
+    ``MetricsRegistry.add_callback``. Callbacks run inline on the frame path,
+    so keep them cheap.
+    """
+
+    def on_stage(self, stage, seconds):
+        """Called after every timed stage ('decode', 'enhance', 'track', ...)."""
+
+    def on_count(self, name, value, labels):
+        """Called whenever a counter is incremented."""
+
+
+class _StageTimer:
+    """Context manager returned by ``MetricsRegistry.stage``."""
+
+    __slots__ = ('registry', 'stage', 'start', 'elapsed')
+
+    def __init__(self, registry, stage):
+        self.registry = registry
+        self.stage = stage
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self.start
+        self.registry.observe(self.stage, self.elapsed)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Thread-safe stage timings (histograms) and counters.
+
+    Stages: decode, motion, enhance, track, predict, annotate, render, write, encode,
+    live_latency (capture to result on live cameras), camera_lag (scheduler dispatch delay).
+    Counters: frames, detections, violations (by type), live_frames_dropped,
+    live_reconnects and camera_frames_skipped (by camera).
+    ``render_prometheus()`` produces the text exposition format for /metrics.
+    """
+
+    # Histogram bucket upper bounds in seconds
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+    def __init__(self, prefix='traffic'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}     # stage -> [bucket counts..., count, sum]
+        self._counters = {}   # (name, labels) -> value
+        self._callbacks = []
+
+    # --- Hooks ---
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def stage(self, name):
+        """Time a block: ``with metrics.stage('enhance'): ...``"""
+        return _StageTimer(self, name)
+
+    def observe(self, stage, seconds):
+        """Record one duration for ``stage``."""
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = [0] * (len(self.BUCKETS) + 1) + [0.0]
+            index = bisect.bisect_left(self.BUCKETS, seconds)
+            if index < len(self.BUCKETS):
+                hist[index] += 1
+            hist[-2] += 1
+            hist[-1] += seconds
+        for callback in self._callbacks:
+            callback.on_stage(stage, seconds)
+
+    def count(self, name, value=1, **labels):
+        """Increment counter ``name`` (optionally labelled)."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        for callback in self._callbacks:
+            callback.on_count(name, value, labels)
+
+    # --- Export ---
+    def snapshot(self):
+        """Plain-dict view: per-stage count / total / mean seconds and counters."""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': hist[-2],
+                    'seconds': round(hist[-1], 6),
+                    'mean_ms': round(hist[-1] / hist[-2] * 1000, 3) if hist[-2] else 0.0,
+                }
+                for stage, hist in self._stages.items()
+            }
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                label_text = ','.join(f"{k}={v}" for k, v in labels)
+                counters[f"{name}{{{label_text}}}" if label_text else name] = value
+        return {'stages': stages, 'counters': counters}
+
+    def render_prometheus(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            stages = {stage: list(hist) for stage, hist in self._stages.items()}
+            counters = dict(self._counters)
+
+        metric = f"{self.prefix}_stage_seconds"
+        lines = [
+            f"# HELP {metric} Time spent per pipeline stage.",
+            f"# TYPE {metric} histogram",
+        ]
+        for stage in sorted(stages):
+            hist = stages[stage]
+            cumulative = 0
+            for bound, bucket in zip(self.BUCKETS, hist):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {hist[-2]}')
+            lines.append(f'{metric}_sum{{stage="{stage}"}} {hist[-1]:.6f}')
+            lines.append(f'{metric}_count{{stage="{stage}"}} {hist[-2]}')
+
+        by_name = {}
+        for (name, labels), value in counters.items():
+            by_name.setdefault(name, []).append((labels, value))
+        for name in sorted(by_name):
+            full = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {full} counter")
+            for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                if labels:
+                    label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f"{full}{{{label_text}}} {value}")
+                else:
+                    lines.append(f"{full} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide default registry (what /metrics serves)
+METRICS = MetricsRegistry()
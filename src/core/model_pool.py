@@ -0,0 +1,179 @@
+import copy
+import os
+import threading
+
+import numpy as np
+
+from core.backends import DEFAULT_BACKEND, collect_calibration_frames, load_model
+from core.batcher import MicroBatcher
+
+
+class TrackerState:
+    """Tracker state owned by one detector session.
+
+    The shared base model keeps its trackers on ``model.predictor.trackers``.
+    Each session keeps its own copy here and swaps it in around ``track()``
+    so the tracks of one stream never leak into another.
+    """
+
+    def __init__(self):
+        self.trackers = None
+
+    def reset(self):
+        self.trackers = None
+
+
+BASE_WEIGHTS = '../../yolov8n.pt'
+
+
+def find_violation_weights():
+    """Locate the custom violation weights (latest training run first)."""
+    # Priority 1: Check for latest trained model in runs/
+    latest_model = r'../../runs/detect/traffic_night_model5/weights/best.pt'
+    fallback_model = r'../../models/weights/custom_traffic.pt'
+
+    if os.path.exists(latest_model):
+        print(f"✅ Found latest trained model at: {latest_model}")
+        return latest_model
+    if os.path.exists(fallback_model):
+        print(f"⚠️ Latest model not found, falling back to: {fallback_model}")
+        return fallback_model
+    print("⚠️ No custom model found! Violation detection might utilize base model only.")
+    return None
+
+
+class ModelPool:
+    """
+    Process-wide holder for the YOLO models.
+
+    Loads the base (vehicles) model and the custom violation model once,
+    warms them up and serializes access to each one, so a new detector
+    session is just a couple of object references.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, model_path=None, warmup=True, backend=None):
+        """
+        Args:
+            model_path (str, optional): Custom violation weights
+            warmup (bool): Run a blank frame through both models after loading
+            backend (str, optional): 'torch', 'onnx' or 'onnx-int8' (see core.backends);
+                defaults to $TRAFFIC_BACKEND or 'torch'
+        """
+        self.backend = backend or DEFAULT_BACKEND
+        # INT8 calibration frames, collected lazily and shared by both models
+        self._calibration = {}
+
+        # --- Model 1: Base Model for Vehicles (Context & Signal Jump via Line Cross) ---
+        self.base_model_path = BASE_WEIGHTS
+        if not os.path.exists(self.base_model_path):
+             # Try downloading or find in weights? usually it downloads automatically
+             print("⚠️ yolov8n.pt not found locally, YOLO will attempt download.")
+
+        print(f"🔄 Loading Base Model (Vehicles): {self.base_model_path}")
+        # Calibration frames are only collected if an INT8 model has to be (re-)quantized
+        self.base_model, _ = load_model(self.base_model_path, self.backend,
+                                        calibration_frames=lambda: self._calibration_frames(enhanced=False))
+
+        # --- Model 2: Custom Model for Violations (No Helmet, etc) ---
+        if model_path is None:
+            model_path = find_violation_weights()
+
+        self.violation_model_path = model_path
+        self.violation_model = None
+        if model_path:
+            print(f"🔄 Loading Custom Model (Violations): {os.path.abspath(model_path)}")
+            try:
+                self.violation_model, _ = load_model(
+                    model_path, self.backend, calibration_frames=lambda: self._calibration_frames(enhanced=True))
+                print(f"📋 Custom Model Classes: {self.violation_model.names}")
+            except Exception as e:
+                print(f"❌ Failed to load custom model: {e}")
+
+        # Ultralytics predictors are not thread-safe; one lock per model
+        self.base_lock = threading.Lock()
+        self.violation_lock = threading.Lock()
+
+        # Pristine tracker list copied into every new session
+        self._tracker_template = None
+
+        # Micro-batchers for the violation model, shared by every session
+        self._batchers = {}
+        self._batchers_lock = threading.Lock()
+
+        if warmup:
+            self.warmup()
+
+    @classmethod
+    def shared(cls, model_path=None, backend=None):
+        """Return the process-wide pool, loading it on first use."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(model_path=model_path, backend=backend)
+            return cls._shared
+
+    def _calibration_frames(self, enhanced):
+        """Frames from data/input for INT8 calibration (None for other backends)."""
+        if self.backend != 'onnx-int8':
+            return None
+        if enhanced not in self._calibration:
+            # The violation model sees night-enhanced frames, the base model raw ones
+            from core.enhancer import NightEnhancer
+            self._calibration[enhanced] = collect_calibration_frames(
+                enhancer=NightEnhancer() if enhanced else None)
+        return self._calibration[enhanced]
+
+    def warmup(self, size=(640, 640)):
+        """Run one blank frame through each model so the first real frame is fast."""
+        blank = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+        print("🔥 Warming up models...")
+        with self.base_lock:
+            self.base_model.track(blank, persist=True, verbose=False)
+            trackers = getattr(self.base_model.predictor, 'trackers', None)
+            if trackers is not None:
+                self._tracker_template = copy.deepcopy(trackers)
+        if self.violation_model:
+            with self.violation_lock:
+                self.violation_model.predict(blank, verbose=False)
+
+    def track(self, frame, state, **kwargs):
+        """
+        Run the base model tracker with the caller's own tracker state.
+
+        Args:
+            frame (np.ndarray): BGR frame
+            state (TrackerState): Session tracker state, updated in place
+            **kwargs: Forwarded to ``YOLO.track``
+        """
+        with self.base_lock:
+            predictor = self.base_model.predictor
+            if predictor is not None and self._tracker_template is not None:
+                if state.trackers is None:
+                    state.trackers = copy.deepcopy(self._tracker_template)
+                predictor.trackers = state.trackers
+            results = self.base_model.track(frame, persist=True, verbose=False, **kwargs)
+            state.trackers = getattr(self.base_model.predictor, 'trackers', None)
+        return results
+
+    def predict(self, source, **kwargs):
+        """Run the violation model (``source`` may be one frame or a list)."""
+        with self.violation_lock:
+            return self.violation_model.predict(source, verbose=False, **kwargs)
+
+    def get_batcher(self, batch_size=8, max_delay=0.03, **predict_kwargs):
+        """
+        Shared ``MicroBatcher`` for the violation model.
+
+        Sessions asking for the same settings get the same batcher, so frames
+        from several streams end up in one batched predict call.
+        """
+        key = (batch_size, max_delay, tuple(sorted(predict_kwargs.items())))
+        with self._batchers_lock:
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                batcher = MicroBatcher(lambda frames: self.predict(frames, **predict_kwargs),
+                                       batch_size=batch_size, max_delay=max_delay)
+                self._batchers[key] = batcher
+            return batcher
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+
+
+class MotionResult:
+    """Outcome of one ``MotionGate.update`` call."""
+
+    __slots__ = ('active', 'fraction', 'region', 'forced')
+
+    def __init__(self, active, fraction=0.0, region=None, forced=False):
+        self.active = active        # run inference on this frame?
+        self.fraction = fraction    # share of low-res pixels that changed
+        self.region = region        # [x1, y1, x2, y2] in full-frame pixels, or None
+        self.forced = forced        # keyframe forced by max_skip rather than motion
+
+
+class MotionGate:
+    """
+    Cheap motion pre-stage run before any inference.
+
+    Frames are downscaled to a small grayscale image and differenced against
+    the previous one. When nothing moves inference can be skipped entirely;
+    otherwise the bounding region of motion tells the violation model where
+    to look. A keyframe is still forced every ``max_skip`` frames so slow
+    changes are not missed forever.
+    """
+
+    def __init__(self, scale_width=160, pixel_threshold=25, min_fraction=0.002,
+                 padding=0.15, max_skip=150, blur=5):
+        """
+        Args:
+            scale_width (int): Width of the low-res motion image
+            pixel_threshold (int): Per-pixel absolute difference that counts as motion
+            min_fraction (float): Share of changed pixels needed to call a frame active
+            padding (float): Region padding, as a fraction of the region size
+            max_skip (int): Force a full keyframe after this many static frames
+            blur (int): Gaussian blur kernel (odd) to suppress sensor noise
+        """
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.padding = padding
+        self.max_skip = max_skip
+        self.blur = blur
+
+        self._previous = None
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+        self.static_frames = 0
+        self.skipped = 0
+
+    def reset(self):
+        self._previous = None
+        self.static_frames = 0
+
+    def _small_gray(self, frame):
+        height, width = frame.shape[:2]
+        small_h = max(1, int(height * self.scale_width / width))
+        small = cv2.resize(frame, (self.scale_width, small_h), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if self.blur:
+            gray = cv2.GaussianBlur(gray, (self.blur, self.blur), 0)
+        return gray
+
+    def update(self, frame):
+        """
+        Feed the next frame (in order).
+
+        Returns:
+            MotionResult: whether to run inference and where the motion is
+        """
+        height, width = frame.shape[:2]
+        gray = self._small_gray(frame)
+        previous, self._previous = self._previous, gray
+        full_frame = [0, 0, width, height]
+
+        # First frame (or size change): always a keyframe
+        if previous is None or previous.shape != gray.shape:
+            self.static_frames = 0
+            return MotionResult(True, 1.0, full_frame, forced=True)
+
+        diff = cv2.absdiff(gray, previous)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        changed = cv2.countNonZero(mask)
+        fraction = changed / float(mask.size)
+
+        if fraction < self.min_fraction:
+            self.static_frames += 1
+            if self.static_frames >= self.max_skip:
+                self.static_frames = 0
+                return MotionResult(True, fraction, full_frame, forced=True)
+            self.skipped += 1
+            return MotionResult(False, fraction)
+
+        self.static_frames = 0
+        x, y, w, h = cv2.boundingRect(cv2.findNonZero(mask))
+        scale = width / float(gray.shape[1])
+        pad_x, pad_y = w * self.padding, h * self.padding
+        region = [
+            max(0, int((x - pad_x) * scale)),
+            max(0, int((y - pad_y) * scale)),
+            min(width, int((x + w + pad_x) * scale)),
+            min(height, int((y + h + pad_y) * scale)),
+        ]
+        return MotionResult(True, fraction, region)
@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+
+
+# Sentinel pushed through the queues when a stage is done
+_END = object()
+
+
+class _StageError:
+    """Wraps an exception raised inside a stage so it can travel downstream."""
+
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+
+
+class VideoPipeline:
+    """
+    Staged, multi-threaded frame pipeline for ``TrafficDetector.process_video``.
+
+    decode -> enhance (+ batched violation predict) -> detect/annotate -> (write, consumer)
+
+    Every arrow is a bounded queue, so a slow stage applies back-pressure to
+    the ones before it instead of piling frames up in memory. Frames are
+    handled by one thread per stage, which keeps their order (tracking needs
+    it) while letting decode, enhancement, inference and ``VideoWriter``
+    output overlap.
+    """
+
+    def __init__(self, detector, queue_size=8, put_timeout=0.1, render=True):
+        """
+        Args:
+            detector (TrafficDetector): Detector session doing the actual work
+            queue_size (int): Capacity of each inter-stage queue
+            put_timeout (float): Poll interval used to notice a stop request
+            render (bool): Draw annotated frames (False: structured results only)
+        """
+        self.detector = detector
+        self.render = render
+        self.queue_size = max(1, int(queue_size))
+        self.put_timeout = put_timeout
+
+        self.queues = {
+            'decode': queue.Queue(maxsize=self.queue_size),
+            'enhance': queue.Queue(maxsize=self.queue_size),
+            'write': queue.Queue(maxsize=self.queue_size),
+            'output': queue.Queue(maxsize=self.queue_size),
+        }
+        self.peak_depth = {name: 0 for name in self.queues}
+        self.frames_done = {name: 0 for name in ('decode', 'enhance', 'detect', 'write')}
+
+        self._stop = threading.Event()
+        self._threads = []
+
+    # --- Queue helpers ---
+    def _put(self, name, item):
+        """Blocking put that gives up when the pipeline is stopped."""
+        q = self.queues[name]
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=self.put_timeout)
+            except queue.Full:
+                continue
+            depth = q.qsize()
+            if depth > self.peak_depth[name]:
+                self.peak_depth[name] = depth
+            return True
+        return False
+
+    def _get(self, name):
+        q = self.queues[name]
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=self.put_timeout)
+            except queue.Empty:
+                continue
+        return _END
+
+    def queue_depths(self):
+        """Current and peak depth of every queue plus frames completed per stage."""
+        return {
+            'capacity': self.queue_size,
+            'depth': {name: q.qsize() for name, q in self.queues.items()},
+            'peak': dict(self.peak_depth),
+            'frames': dict(self.frames_done),
+        }
+
+    # --- Stages ---
+    def _decode(self, source):
+        try:
+            while not self._stop.is_set():
+                with self.detector.metrics.stage('decode'):
+                    item = source.read()
+                if item is None:
+                    break
+                index, frame = item
+                self.frames_done['decode'] += 1
+                if not self._put('decode', (index + 1, frame)):
+                    return
+        except Exception as e:
+            self._put('decode', _StageError('decode', e))
+        self._put('decode', _END)
+
+    def _enhance(self):
+        while True:
+            item = self._get('decode')
+            if item is _END or isinstance(item, _StageError):
+                self._put('enhance', item)
+                return
+            frame_count, frame = item
+            try:
+                start = time.perf_counter()
+                # Motion and cadence are decided here so skipped frames are not enhanced at all
+                self.detector.check_motion(frame, frame_count)
+                run_violation = self.detector.violation_due(frame_count)
+                enhanced = self.detector.enhance_night_frame(frame) if run_violation else None
+                enhance_seconds = time.perf_counter() - start
+            except Exception as e:
+                self._put('enhance', _StageError('enhance', e))
+                return
+            # Submit to the violation batcher now so frames queued behind this
+            # one can share its batch while tracking still runs in order
+            batcher = self.detector.batcher
+            pending = None
+            # Crop mode needs this frame's tracks first, so its crops are submitted in detect
+            if batcher is not None and run_violation and not self.detector.crop_violations:
+                model_input, _ = self.detector.violation_input(enhanced, frame_count)
+                pending = batcher.submit(model_input)
+            self.frames_done['enhance'] += 1
+            if not self._put('enhance', (frame_count, frame, enhanced, run_violation, pending, enhance_seconds)):
+                return
+
+    def _detect(self, writer):
+        while True:
+            item = self._get('enhance')
+            if item is _END or isinstance(item, _StageError):
+                if writer is not None:
+                    self._put('write', _END)
+                self._put('output', item)
+                return
+            frame_count, frame, enhanced, run_violation, pending, enhance_seconds = item
+            try:
+                start = time.perf_counter()
+                custom_results = None
+                if pending is not None:
+                    # Batched predict runs on the batcher thread; count the wait for it
+                    with self.detector.metrics.stage('predict'):
+                        custom_results = pending.result()
+                processed_frame, violations = self.detector.detect_violations(
+                    frame, enhanced, frame_count, custom_results=custom_results, run_violation=run_violation,
+                    render=self.render)
+                self.detector.record_frame_cost(enhance_seconds + time.perf_counter() - start, frame_count)
+                # This stage runs ahead of the consumer: keep the frame's tracks with it
+                tracks = self.detector.track_snapshot()
+            except Exception as e:
+                if writer is not None:
+                    self._put('write', _END)
+                self._put('output', _StageError('detect', e))
+                return
+            self.frames_done['detect'] += 1
+            if writer is not None and not self._put('write', processed_frame):
+                return
+            if not self._put('output', (frame_count, processed_frame, violations, tracks)):
+                return
+
+    def _write(self, writer):
+        while True:
+            item = self._get('write')
+            if item is _END:
+                return
+            with self.detector.metrics.stage('write'):
+                writer.write(item)
+            self.frames_done['write'] += 1
+
+    # --- Driver ---
+    def run(self, source, writer=None):
+        """
+        Run the pipeline over an opened ``FrameSource`` (already positioned at its first frame).
+
+        Yields:
+            tuple: ``(frame_count, processed_frame, violations, tracks)`` in decode order;
+            ``tracks`` is ``detector.track_snapshot()`` taken right after that frame
+        """
+        # Enhanced frames live in the enhance queue plus one in each neighbouring stage
+        enhancer = self.detector.enhancer
+        enhancer.set_pool_size(max(enhancer.pool_size, self.queue_size + 3))
+
+        targets = [
+            (self._decode, (source,)),
+            (self._enhance, ()),
+            (self._detect, (writer,)),
+        ]
+        if writer is not None:
+            targets.append((self._write, (writer,)))
+        self._threads = [threading.Thread(target=t, args=a, daemon=True) for t, a in targets]
+        for t in self._threads:
+            t.start()
+
+        finished = False
+        try:
+            while True:
+                item = self._get('output')
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, _StageError):
+                    raise RuntimeError(f"Pipeline stage '{item.stage}' failed: {item.error}") from item.error
+                yield item
+        finally:
+            # Normal end: let the writer drain its queue. Early exit: stop everything.
+            if finished and writer is not None:
+                self._threads[-1].join()
+            self._stop.set()
+            # A live source may be blocked waiting for the next frame
+            source.interrupt()
+            for t in self._threads:
+                t.join()
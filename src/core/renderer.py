@@ -0,0 +1,63 @@
+import cv2
+
+
+class FrameRenderer:
+    """
+    Draws a frame analysis (see ``TrafficDetector.analyze_frame``) onto a copy of the frame.
+
+    Kept apart from detection so headless jobs never copy or draw anything;
+    rendering only happens for frames that are streamed or written.
+    """
+
+    STOP_LINE_COLOR = (0, 0, 255)
+    VEHICLE_COLOR = (0, 255, 0)
+    SIGNAL_JUMP_COLOR = (0, 0, 255)
+    TRIPLE_RIDING_COLOR = (255, 0, 0)
+    VIOLATION_COLOR = (0, 0, 255)
+
+    def render(self, frame, analysis):
+        """
+        Args:
+            frame (np.ndarray): Original BGR frame (left untouched)
+            analysis (dict): Structured result of ``TrafficDetector.analyze_frame``
+
+        Returns:
+            np.ndarray: Annotated copy of ``frame``
+        """
+        annotated_frame = frame.copy()
+        width = frame.shape[1]
+        stop_line_y = analysis['stop_line_y']
+
+        # Stop line (always red for visibility)
+        cv2.line(annotated_frame, (0, stop_line_y), (width, stop_line_y), self.STOP_LINE_COLOR, 3)
+
+        for vehicle in analysis['vehicles']:
+            x1, y1, x2, y2 = vehicle['bbox']
+            color = self.VEHICLE_COLOR
+            if vehicle['signal_jump']:
+                color = self.SIGNAL_JUMP_COLOR
+                cv2.putText(annotated_frame, "SIGNAL JUMP", (x1, y1-10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.SIGNAL_JUMP_COLOR, 2)
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+            track_id = vehicle['track_id']
+            label_text = f"{vehicle['label']} {track_id}" if track_id else vehicle['label']
+            cv2.putText(annotated_frame, label_text, (x1, y1-30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        # Rider-count heuristic
+        for violation in analysis['triple_riding']:
+            bx1, by1, bx2, by2 = violation['bbox']
+            cv2.rectangle(annotated_frame, (bx1, by1), (bx2, by2), self.TRIPLE_RIDING_COLOR, 3)
+            cv2.putText(annotated_frame, "TRIPLE RIDING", (bx1, by1-60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, self.TRIPLE_RIDING_COLOR, 2)
+
+        # Violation-model detections (unassigned ones carry a 'loc_...' string id)
+        for violation in analysis['model_violations']:
+            vx1, vy1, vx2, vy2 = violation['bbox']
+            track_id = violation['track_id']
+            t_id_str = "" if isinstance(track_id, str) else f"ID:{track_id}"
+            cv2.rectangle(annotated_frame, (vx1, vy1), (vx2, vy2), self.VIOLATION_COLOR, 3)
+            cv2.putText(annotated_frame, f"{violation['type']} {t_id_str}", (vx1, vy1-10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, self.VIOLATION_COLOR, 2)
+
+        return annotated_frame
@@ -0,0 +1,316 @@
+import os
+import threading
+import time
+from collections import deque
+
+from core.detector import TrafficDetector
+from core.evidence import EvidenceRecorder
+from core.live_source import LiveFrameSource
+from core.metrics import METRICS
+from core.model_pool import ModelPool
+from core.motion import MotionGate
+
+
+POLICIES = ('round_robin', 'priority')
+
+
+class Camera:
+    """One scheduled camera: its live source, detector, FPS budget and lag bookkeeping."""
+
+    def __init__(self, name, source, detector, target_fps, priority=0, broadcaster=None, evidence=None,
+                 on_result=None, window=10.0):
+        self.name = name
+        self.source = source
+        self.detector = detector
+        self.target_fps = float(target_fps)
+        self.period = 1.0 / self.target_fps
+        self.priority = priority
+        self.broadcaster = broadcaster
+        self.evidence = evidence
+        self.on_result = on_result
+
+        self.next_due = time.monotonic()
+        self.busy = False
+        self.ended = False
+        self.window = window
+        self._done_times = deque()   # completion times within the last ``window`` seconds
+
+        # Stats
+        self.frames = 0
+        self.analysed = 0    # frames handed to the detector (evidence clips count in these)
+        self.skipped = 0     # budget slots missed because the box was too busy
+        self.lag = 0.0       # how late (seconds) the last frame was dispatched
+        self.max_lag = 0.0
+        self.busy_seconds = 0.0
+        self.started = time.monotonic()
+
+    def completed(self, now, seconds):
+        self.frames += 1
+        self.busy_seconds += seconds
+        self._done_times.append(now)
+        while self._done_times and now - self._done_times[0] > self.window:
+            self._done_times.popleft()
+
+    def achieved_fps(self, now=None):
+        now = time.monotonic() if now is None else now
+        span = min(self.window, now - self.started)
+        return len(self._done_times) / span if span > 0 else 0.0
+
+    def current_lag(self, now=None):
+        """Lag of the last dispatch, or how overdue the pending slot already is if that is worse."""
+        now = time.monotonic() if now is None else now
+        if self.busy or self.ended:
+            return self.lag
+        return max(self.lag, now - self.next_due)
+
+    def behind(self, now=None):
+        """True when the camera is not getting its FPS budget (rate judged after one full window)."""
+        now = time.monotonic() if now is None else now
+        if self.current_lag(now) > self.period:
+            return True
+        return now - self.started >= self.window and self.achieved_fps(now) < 0.9 * self.target_fps
+
+    def stats(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            'camera': self.name,
+            'target_fps': self.target_fps,
+            'fps': round(self.achieved_fps(now), 2),
+            'priority': self.priority,
+            'frames': self.frames,
+            # Including the slots a starved camera is missing right now
+            'skipped': self.skipped + (int((now - self.next_due) // self.period)
+                                       if not self.busy and not self.ended and now > self.next_due else 0),
+            'lag_ms': round(self.current_lag(now) * 1000, 1),
+            'max_lag_ms': round(max(self.max_lag, self.current_lag(now)) * 1000, 1),
+            'behind': self.behind(now),
+            'ended': self.ended,
+            'source': self.source.stats(),
+        }
+
+
+class CameraScheduler:
+    """
+    Runs many live cameras on one box against a shared ``ModelPool``.
+
+    Each camera gets a frame-rate budget (``target_fps``). A dispatcher
+    thread hands the newest frame of every camera whose slot is due to a
+    fixed set of worker threads; a camera is never processed by two workers
+    at once, so its tracker sees frames in order.
+
+    - ``round_robin``: the most overdue camera goes first, so every camera
+      gets its share in proportion to its budget.
+    - ``priority``: higher ``priority`` cameras go first; ties are overdue-first.
+      Strict: on an overloaded box lower-priority cameras get what is left, possibly nothing.
+
+    When the box cannot keep up, a camera's missed slots are skipped (counted
+    in ``skipped`` and the ``camera_frames_skipped`` counter) instead of
+    queueing, and its lag (how late its frames are dispatched) grows;
+    ``stats()['oversubscribed']`` turns true while any camera is behind.
+    """
+
+    def __init__(self, pool=None, workers=2, policy='round_robin', motion_gating=False,
+                 evidence_dir=None, batch_size=1, max_batch_delay=0.03, metrics=None):
+        """
+        Args:
+            pool (ModelPool, optional): Shared models (default: ``ModelPool.shared()``)
+            workers (int): Frames analysed concurrently (model calls still serialize on the pool)
+            policy (str): 'round_robin' or 'priority'
+            motion_gating (bool): Skip inference on static frames (see ``MotionGate``)
+            evidence_dir (str): Write evidence clips per camera under ``<evidence_dir>/<camera>``
+                (their frame numbers count analysed frames, recorded at ``target_fps``)
+            batch_size (int): When > 1, the workers' violation-model calls share the pool's
+                ``MicroBatcher``, so frames of different cameras go through one predict
+                (capped at ``workers``: no more frames are ever in flight)
+            max_batch_delay (float): Seconds a frame may wait for the other workers' frames
+            metrics (MetricsRegistry, optional): Where lag timings and skip counters go
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {POLICIES}")
+        self.pool = pool if pool is not None else ModelPool.shared()
+        self.workers = max(1, int(workers))
+        self.policy = policy
+        self.motion_gating = motion_gating
+        self.evidence_dir = evidence_dir
+        self.batch_size = min(max(1, int(batch_size)), self.workers)
+        self.max_batch_delay = max_batch_delay
+        self.metrics = metrics if metrics is not None else METRICS
+
+        self.cameras = {}
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stop = threading.Event()
+        self._threads = []
+        self._jobs = deque()
+        self.started = None
+
+    # --- Cameras ---
+    def add_camera(self, name, url, target_fps=5.0, priority=0, broadcaster=None, on_result=None):
+        """
+        Start watching a camera (can be called while running).
+
+        Args:
+            name (str): Unique camera name
+            url (str): Stream URL, device index or a file played back as a camera
+            target_fps (float): Frames per second to analyse
+            priority (int): Higher runs first under the 'priority' policy
+            broadcaster (FrameBroadcaster, optional): Annotated frames are published here
+                (and only rendered while someone is watching)
+            on_result (callable, optional): ``on_result(camera, frame_count, frame, violations)``
+                after every analysed frame, on the worker thread
+
+        Returns:
+            Camera
+        """
+        if name in self.cameras:
+            raise ValueError(f"Camera '{name}' already exists")
+        source = LiveFrameSource(url, name=name, open_timeout=0, metrics=self.metrics)
+        detector = TrafficDetector(pool=self.pool, metrics=self.metrics,
+                                   motion_gate=MotionGate() if self.motion_gating else None)
+        detector.source = source
+        detector.set_batching(self.batch_size, self.max_batch_delay)
+        evidence = None
+        if self.evidence_dir is not None:
+            evidence = EvidenceRecorder(os.path.join(self.evidence_dir, name), fps=target_fps,
+                                        prefix=name, metrics=self.metrics)
+            detector.evidence = evidence
+        camera = Camera(name, source, detector, target_fps, priority=priority, broadcaster=broadcaster,
+                        evidence=evidence, on_result=on_result)
+        with self._cond:
+            self.cameras[name] = camera
+            self._cond.notify_all()
+        return camera
+
+    def remove_camera(self, name):
+        with self._cond:
+            camera = self.cameras.pop(name, None)
+            if camera is None:
+                return
+            self._cond.wait_for(lambda: not camera.busy)
+        self._close_camera(camera)
+
+    def _close_camera(self, camera):
+        camera.source.release()
+        if camera.evidence is not None:
+            camera.evidence.close()
+        if camera.broadcaster is not None:
+            camera.broadcaster.close()
+
+    # --- Running ---
+    def start(self):
+        self.started = time.monotonic()
+        self._threads = [threading.Thread(target=self._dispatch, daemon=True)]
+        self._threads += [threading.Thread(target=self._work, daemon=True) for _ in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        print(f"🎛️ Scheduler: {len(self.cameras)} cameras, {self.workers} workers, {self.policy}")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        for camera in list(self.cameras.values()):
+            self._close_camera(camera)
+
+    def _order(self, cameras):
+        if self.policy == 'priority':
+            return sorted(cameras, key=lambda c: (-c.priority, c.next_due))
+        return sorted(cameras, key=lambda c: c.next_due)
+
+    def _dispatch(self):
+        while not self._stop.is_set():
+            with self._cond:
+                now = time.monotonic()
+                due = [c for c in self.cameras.values() if not c.busy and not c.ended and c.next_due <= now]
+                starved = False
+                for camera in self._order(due):
+                    if self._in_flight >= self.workers:
+                        break
+                    item = camera.source.latest()
+                    if item is None:
+                        if camera.source.ended:
+                            camera.ended = True
+                            print(f"⏹️ {camera.name}: stream ended")
+                        # Waiting for the camera is not lag: the slot starts when its frame arrives
+                        camera.next_due = now
+                        starved = True
+                        continue
+                    # Slots missed while the box was busy are dropped, not queued
+                    lag = now - camera.next_due
+                    missed = int(lag // camera.period)
+                    if missed:
+                        camera.skipped += missed
+                        self.metrics.count('camera_frames_skipped', missed, camera=camera.name)
+                    camera.next_due += camera.period * (missed + 1)
+                    camera.lag = lag
+                    camera.max_lag = max(camera.max_lag, lag)
+                    self.metrics.observe('camera_lag', lag)
+                    camera.busy = True
+                    self._in_flight += 1
+                    self._jobs.append((camera, item))
+                    self._cond.notify_all()
+                # Sleep until the next slot comes due or a worker frees up
+                idle = [c.next_due for c in self.cameras.values() if not c.busy and not c.ended]
+                wait = min(idle) - time.monotonic() if idle else 0.1
+                # Cameras without a new frame are polled again shortly
+                self._cond.wait(timeout=min(max(wait, 0.005 if starved else 0.001), 0.1))
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs or self._stop.is_set())
+                if self._stop.is_set():
+                    return
+                camera, (index, frame) = self._jobs.popleft()
+            start = time.monotonic()
+            try:
+                self._process(camera, index, frame)
+            except Exception as e:
+                print(f"⚠️ {camera.name}: frame {index + 1} failed: {e}")
+            finally:
+                now = time.monotonic()
+                with self._cond:
+                    camera.completed(now, now - start)
+                    camera.busy = False
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _process(self, camera, index, frame):
+        frame_count = index + 1
+        detector = camera.detector
+        # Drawing only pays off while someone watches or evidence is recorded
+        render = camera.evidence is not None or (camera.broadcaster is not None and
+                                                 camera.broadcaster.client_count > 0)
+        processed_frame, violations = detector.process_frame(frame, frame_count, render=render)
+        camera.analysed += 1
+        if camera.evidence is not None:
+            # Captured frame numbers jump by the skipped frames; clips are timed in analysed ones
+            camera.evidence.add(processed_frame, camera.analysed, violations)
+        detector.frame_position = frame_count
+        camera.source.done(index)
+        if camera.broadcaster is not None and processed_frame is not None:
+            camera.broadcaster.publish(processed_frame)
+        if camera.on_result is not None:
+            camera.on_result(camera, frame_count, processed_frame, violations)
+
+    # --- Stats ---
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            cameras = [c.stats(now) for c in self.cameras.values()]
+            busy = sum(c.busy_seconds for c in self.cameras.values())
+        elapsed = now - self.started if self.started else 0.0
+        return {
+            'policy': self.policy,
+            'workers': self.workers,
+            'cameras': cameras,
+            'target_fps': round(sum(c['target_fps'] for c in cameras if not c['ended']), 2),
+            'fps': round(sum(c['fps'] for c in cameras), 2),
+            # Share of worker time spent analysing; close to 1.0 means no headroom left
+            'utilization': round(busy / (elapsed * self.workers), 3) if elapsed > 0 else 0.0,
+            'oversubscribed': any(c['behind'] for c in cameras if not c['ended']),
+        }
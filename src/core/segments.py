@@ -0,0 +1,97 @@
+"""
+Segment-parallel processing of one long video.
+
+The video is cut into time segments that are processed independently (one
+worker process each). Every segment except the first starts ``overlap``
+frames early: those warm-up frames let its fresh tracker lock on, and since
+the previous segment processes the same frames, the two sets of tracks can
+be matched box by box. The matches turn into a track-id remapping that is
+applied while merging, so a vehicle crossing a boundary keeps one identity
+and is counted once.
+"""
+from collections import Counter
+
+from core.geometry import as_boxes, iou_matrix
+
+# Track ids of segment k are offset by k * ID_STRIDE so segments never collide
+ID_STRIDE = 1000000
+
+
+def plan_segments(total_frames, segments, overlap=30, min_length=300):
+    """
+    Split ``total_frames`` into up to ``segments`` parts.
+
+    Returns:
+        list: dicts with 'index', 'start' (first owned frame, 1-based), 'end'
+        (last owned frame, inclusive; None for the last segment, read to EOF)
+        and 'warm_start' (first frame processed, ``overlap`` frames earlier)
+    """
+    if total_frames <= 0:
+        return [{'index': 0, 'start': 1, 'end': None, 'warm_start': 1}]
+    count = max(1, min(int(segments), total_frames // max(1, min_length)))
+    length = total_frames // count
+    plan = []
+    for index in range(count):
+        start = index * length + 1
+        end = (index + 1) * length if index < count - 1 else None
+        plan.append({
+            'index': index,
+            'start': start,
+            'end': end,
+            'warm_start': max(1, start - overlap) if index else 1,
+        })
+    return plan
+
+
+def match_tracks(previous, current, min_iou=0.5, min_votes=3):
+    """
+    Match track ids of two segments over their shared frames.
+
+    Args:
+        previous (dict): frame -> [(track_id, bbox)] from the earlier segment
+        current (dict): frame -> [(track_id, bbox)] from the later segment (warm-up)
+        min_iou (float): Box overlap that counts as the same object in one frame
+        min_votes (int): Frames in which a pair must match before it is trusted
+
+    Returns:
+        dict: current track id -> previous track id
+    """
+    votes = Counter()
+    for frame, tracks in current.items():
+        earlier = previous.get(frame)
+        if not earlier or not tracks:
+            continue
+        ious = iou_matrix(as_boxes([box for _, box in tracks]), as_boxes([box for _, box in earlier]))
+        for i, (track_id, _) in enumerate(tracks):
+            j = int(ious[i].argmax())
+            if ious[i, j] >= min_iou:
+                votes[(track_id, earlier[j][0])] += 1
+
+    mapping, used = {}, set()
+    for (cur_id, prev_id), n in votes.most_common():
+        if n < min_votes:
+            break
+        if cur_id in mapping or prev_id in used:
+            continue
+        mapping[cur_id] = prev_id
+        used.add(prev_id)
+    return mapping
+
+
+def stitch(results, min_iou=0.5, min_votes=3):
+    """
+    Chain the boundary matches of consecutive segments into one id remapping.
+
+    Args:
+        results (list): Segment results in order, each with 'head' (tracks of its
+            warm-up frames) and 'tail' (tracks of its last ``overlap`` owned frames)
+
+    Returns:
+        dict: segment-local track id -> stitched track id
+    """
+    remap = {}
+    for previous, current in zip(results, results[1:]):
+        votes = min(min_votes, max(1, len(current['head'])))
+        for cur_id, prev_id in match_tracks(previous['tail'], current['head'], min_iou, votes).items():
+            remap[cur_id] = remap.get(prev_id, prev_id)
+    return remap
@@ -0,0 +1,106 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from core.ledger import ViolationLedger
+from core.live_source import LiveFrameSource
+
+
+class StreamSession:
+    """State owned by one analysis job: its ledger and bookkeeping."""
+
+    def __init__(self, session_id, video_path=None):
+        self.id = session_id
+        self.video_path = video_path
+        self.ledger = ViolationLedger()
+        self.created = time.time()
+        self.finished = None
+        self.frames = 0
+        # Detector running this session (set by the app), for quality-controller state
+        self.detector = None
+        # FrameBroadcaster shared by every viewer of this session (set by the app)
+        self.broadcaster = None
+
+    @property
+    def active(self):
+        return self.finished is None
+
+    def info(self):
+        return {
+            'session': self.id,
+            'video': self.video_path,
+            'active': self.active,
+            'frames': self.frames,
+            'created': self.created,
+            'finished': self.finished,
+            'quality': self.detector.controller.state()
+                       if self.detector is not None and self.detector.controller is not None else None,
+            'stream': self.broadcaster.stats() if self.broadcaster is not None else None,
+            # Per-stage queue depths of a pipelined run: the full queue sits before the bottleneck
+            'pipeline': self.detector.pipeline.queue_depths()
+                        if self.detector is not None and self.detector.pipeline is not None else None,
+            'evidence_clips': len(self.detector.evidence.clips)
+                              if self.detector is not None and self.detector.evidence is not None else 0,
+            # Capture / drop / reconnect counters and latency of live cameras
+            'live': self.detector.source.stats()
+                    if self.detector is not None and isinstance(self.detector.source, LiveFrameSource) else None,
+        }
+
+
+class SessionRegistry:
+    """
+    Thread-safe registry of stream sessions.
+
+    Every /video_feed request runs against its own session, so concurrent
+    uploads never share counters. Finished sessions are kept around (up to
+    ``max_finished``) so their stats can still be read.
+    """
+
+    def __init__(self, max_finished=32):
+        self.max_finished = max_finished
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex[:12]
+
+    def create(self, session_id=None, video_path=None):
+        """Create (or restart) a session; a fresh id is generated when none is given."""
+        session_id = session_id or self.new_id()
+        session = StreamSession(session_id, video_path)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._sessions[session_id] = session
+            self._prune()
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def latest(self):
+        """Most recently created session (used when a client does not send an id)."""
+        with self._lock:
+            return next(reversed(self._sessions.values()), None)
+
+    def running(self, video_path):
+        """Active session analysing ``video_path`` (e.g. a live camera), if any."""
+        with self._lock:
+            return next((s for s in reversed(self._sessions.values())
+                         if s.active and s.video_path == video_path), None)
+
+    def finish(self, session):
+        session.finished = time.time()
+        with self._lock:
+            self._prune()
+
+    def list(self):
+        with self._lock:
+            return [s.info() for s in self._sessions.values()]
+
+    def _prune(self):
+        finished = [sid for sid, s in self._sessions.items() if not s.active]
+        for sid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._sessions[sid]
@@ -0,0 +1,204 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS violations (
+    id INTEGER PRIMARY KEY,
+    video TEXT,
+    session TEXT,
+    frame INTEGER,
+    ts REAL,
+    type TEXT,
+    object TEXT,
+    track_id TEXT,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_violations_type ON violations (type, id);
+CREATE INDEX IF NOT EXISTS idx_violations_video ON violations (video, id);
+CREATE INDEX IF NOT EXISTS idx_violations_session ON violations (session, id);
+CREATE INDEX IF NOT EXISTS idx_violations_ts ON violations (ts);
+"""
+
+COLUMNS = ('id', 'video', 'session', 'frame', 'ts', 'type', 'object', 'track_id', 'x1', 'y1', 'x2', 'y2')
+
+
+class ViolationStore:
+    """
+    Persistent, queryable violation history in SQLite.
+
+    ``add()`` only puts rows on a queue; a background thread writes them in
+    batches (one transaction per ``batch_size`` rows or ``flush_interval``
+    seconds), so the frame path never waits for disk. Reads use their own
+    per-thread connections (WAL mode, so they run alongside the writer) and
+    page with an id cursor, which stays fast however many rows there are.
+    """
+
+    def __init__(self, db_path, batch_size=500, flush_interval=0.5):
+        """
+        Args:
+            db_path (str): SQLite file (created with its schema if missing)
+            batch_size (int): Rows per write transaction at most
+            flush_interval (float): Longest time (seconds) a row waits before being written
+        """
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        # Stats
+        self.rows_written = 0
+        self.batches = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # --- Writing ---
+    def add(self, violations, video=None, session=None, frame=None, timestamp=None):
+        """
+        Queue violations (usually the first-seen ones from ``ViolationLedger.record``).
+
+        Args:
+            violations (list): Violation dicts ('type', 'object', 'bbox', 'track_id')
+            video (str): Source video / stream name
+            session (str): Session id
+            frame (int): Frame index the violations were seen on
+            timestamp (float): Unix time (defaults to now)
+        """
+        if not violations:
+            return
+        ts = timestamp if timestamp is not None else time.time()
+        for v in violations:
+            x1, y1, x2, y2 = (list(v.get('bbox') or []) + [None] * 4)[:4]
+            track_id = v.get('track_id')
+            self._queue.put((video, session, v.get('frame', frame), ts, v.get('type'), v.get('object'),
+                             None if track_id is None else str(track_id), x1, y1, x2, y2))
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    self._queue.task_done()
+                    return
+                rows = [first]
+                stop = False
+                deadline = time.monotonic() + self.flush_interval
+                while len(rows) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        row = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        stop = True
+                        break
+                    rows.append(row)
+                try:
+                    with conn:
+                        conn.executemany(
+                            'INSERT INTO violations (video, session, frame, ts, type, object, track_id, '
+                            'x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                    self.rows_written += len(rows)
+                    self.batches += 1
+                except sqlite3.Error as e:
+                    print(f"⚠️ Could not store {len(rows)} violations: {e}")
+                for _ in range(len(rows) + (1 if stop else 0)):
+                    self._queue.task_done()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def discard(self, video, after_frame, session=None):
+        """Delete rows of ``video`` (and ``session``) past ``after_frame``, before re-processing them on resume."""
+        self.flush()
+        sql = 'DELETE FROM violations WHERE video = ? AND frame > ?'
+        params = [video, int(after_frame)]
+        if session is not None:
+            sql += ' AND session = ?'
+            params.append(session)
+        conn = self._reader()
+        with conn:
+            conn.execute(sql, params)
+
+    # --- Reading ---
+    def _reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def query(self, type=None, video=None, session=None, track_id=None, since=None, until=None,
+              cursor=None, limit=100):
+        """
+        Newest-first page of stored violations.
+
+        Args:
+            type, video, session, track_id: Exact-match filters
+            since, until (float): Unix time range [since, until)
+            cursor (int): ``next_cursor`` of the previous page
+            limit (int): Page size (capped at 1000)
+
+        Returns:
+            tuple: ``(rows, next_cursor)``; ``next_cursor`` is None on the last page
+        """
+        limit = max(1, min(int(limit), 1000))
+        clauses, params = [], []
+        for column, value in (('type', type), ('video', video), ('session', session),
+                              ('track_id', None if track_id is None else str(track_id))):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(float(since))
+        if until is not None:
+            clauses.append('ts < ?')
+            params.append(float(until))
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM violations {where} ORDER BY id DESC LIMIT ?"
+        cur = self._reader().execute(sql, params + [limit + 1])
+        rows = [dict(zip(COLUMNS, row)) for row in cur.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['id']
+        for row in rows:
+            row['bbox'] = [row.pop('x1'), row.pop('y1'), row.pop('x2'), row.pop('y2')]
+        return rows, next_cursor
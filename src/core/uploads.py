@@ -0,0 +1,155 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class ChunkedUpload:
+    """One resumable upload: the file being written and how much of it has arrived."""
+
+    def __init__(self, upload_id, filename, path, total=None, received=0, complete=False, created=None):
+        self.id = upload_id
+        self.filename = filename
+        self.path = path
+        self.total = total
+        self.received = received
+        self.complete = complete
+        self.created = created if created is not None else time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def state_path(self):
+        return self.path + '.upload.json'
+
+    def save_state(self):
+        with open(self.state_path, 'w') as f:
+            json.dump(self.info(), f)
+
+    def info(self):
+        return {
+            'upload_id': self.id,
+            'filepath': self.filename,
+            'total': self.total,
+            'offset': self.received,
+            'complete': self.complete,
+            'created': self.created,
+        }
+
+
+class UploadRegistry:
+    """
+    Chunked, resumable uploads written to disk as the data arrives.
+
+    Chunks are appended in order: each one names the offset it starts at,
+    and a chunk whose offset is not the current end of the file is refused,
+    so a client that lost a response asks for the offset and carries on
+    from there. Progress is kept in a ``<file>.upload.json`` sidecar, so an
+    interrupted upload can also be resumed after a server restart. Readers
+    can follow the file while it grows (see ``GrowingFileSource``) and use
+    ``is_complete`` to know when it stops growing.
+    """
+
+    def __init__(self, upload_dir, block_size=1 << 20):
+        """
+        Args:
+            upload_dir (str): Where uploaded files are written
+            block_size (int): Bytes read from the request stream per write
+        """
+        self.upload_dir = upload_dir
+        self.block_size = block_size
+        self._uploads = {}
+        self._lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Pick up uploads that were still in progress when the server stopped."""
+        for name in os.listdir(self.upload_dir):
+            if not name.endswith('.upload.json'):
+                continue
+            try:
+                with open(os.path.join(self.upload_dir, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            path = os.path.join(self.upload_dir, state['filepath'])
+            # The file on disk is the truth: it may hold less than the last saved state
+            received = os.path.getsize(path) if os.path.exists(path) else 0
+            upload = ChunkedUpload(state['upload_id'], state['filepath'], path, total=state.get('total'),
+                                   received=received, complete=state.get('complete', False),
+                                   created=state.get('created'))
+            self._uploads[upload.id] = upload
+
+    def create(self, filename, total=None):
+        """Start a new upload of ``filename`` (already sanitised), replacing any file of that name."""
+        upload = ChunkedUpload(uuid.uuid4().hex[:16], filename, os.path.join(self.upload_dir, filename),
+                               total=int(total) if total is not None else None)
+        with self._lock:
+            for old in [u for u in self._uploads.values() if u.filename == filename]:
+                del self._uploads[old.id]
+            self._uploads[upload.id] = upload
+        open(upload.path, 'wb').close()
+        upload.save_state()
+        return upload
+
+    def get(self, upload_id):
+        with self._lock:
+            return self._uploads.get(upload_id)
+
+    def find(self, filename):
+        """Upload writing ``filename``, if any."""
+        with self._lock:
+            return next((u for u in self._uploads.values() if u.filename == filename), None)
+
+    def is_complete(self, filename):
+        """False while an upload of ``filename`` is still in progress (a plain file is complete)."""
+        upload = self.find(filename)
+        return upload is None or upload.complete
+
+    def write(self, upload, offset, stream):
+        """
+        Append a chunk read from ``stream`` (file-like) at ``offset``.
+
+        Returns:
+            int: Bytes received so far
+
+        Raises:
+            ValueError: ``offset`` is not where the file currently ends, or the upload is complete
+        """
+        with upload.lock:
+            if upload.complete:
+                raise ValueError("Upload already completed")
+            if offset != upload.received:
+                raise ValueError(f"Expected offset {upload.received}, got {offset}")
+            try:
+                with open(upload.path, 'r+b') as f:
+                    f.seek(offset)
+                    while True:
+                        block = stream.read(self.block_size)
+                        if not block:
+                            break
+                        f.write(block)
+                        # Readers following the file see every block as soon as it is written
+                        f.flush()
+                        upload.received += len(block)
+            finally:
+                # A chunk cut off half-way still counts: the client resumes after what arrived
+                upload.save_state()
+            return upload.received
+
+    def complete(self, upload):
+        """
+        Mark the upload finished (the file stops growing).
+
+        Raises:
+            ValueError: Fewer bytes arrived than the declared total
+        """
+        with upload.lock:
+            if upload.total is not None and upload.received != upload.total:
+                raise ValueError(f"Received {upload.received} of {upload.total} bytes")
+            upload.complete = True
+            # Finished uploads need no resume state
+            if os.path.exists(upload.state_path):
+                os.remove(upload.state_path)
+        return upload
@@ -53,24 +53,44 @@ fileInput.addEventListener('change', (e) => {
     }
 });
 
-function uploadVideo(file) {
-    const formData = new FormData();
-    formData.append('video', file);
+// Large files go up in chunks: analysis starts after the first chunk, and a
+// dropped chunk is resumed from the offset the server reports.
+const CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 5;
 
+function uploadVideo(file) {
     addLog('System', `Uploading ${file.name}...`, 'info');
 
-    fetch('/upload', {
+    fetch('/upload/chunked', {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size })
     })
         .then(response => response.json())
         .then(data => {
-            if (data.filepath) {
-                addLog('System', 'Upload successful. Starting analysis...', 'success');
-                startProcessing(data.filepath);
-            } else {
-                addLog('Error', data.error, 'danger');
+            if (!data.upload_id) {
+                addLog('Error', data.error || 'Upload failed.', 'danger');
+                return;
             }
+            let started = false;
+            return sendChunks(file, data.upload_id, () => {
+                // The server follows the file while the rest is still arriving
+                if (!started) {
+                    started = true;
+                    addLog('System', 'First chunk uploaded. Starting analysis...', 'info');
+                    startProcessing(data.filepath, data.session);
+                }
+            })
+                .then(() => fetch(`/upload/chunked/${data.upload_id}/complete`, { method: 'POST' }))
+                .then(response => response.json())
+                .then(result => {
+                    if (result.complete) {
+                        addLog('System', 'Upload successful.', 'success');
+                        if (!started) startProcessing(data.filepath, data.session);
+                    } else {
+                        addLog('Error', result.error, 'danger');
+                    }
+                });
         })
         .catch(error => {
             console.error('Error:', error);
@@ -78,7 +98,45 @@ function uploadVideo(file) {
         });
 }
 
-function startProcessing(filepath) {
+async function sendChunks(file, uploadId, onProgress) {
+    let offset = 0;
+    // Failed attempts at the current chunk; reset once a chunk is accepted
+    let retries = 0;
+
+    while (offset < file.size) {
+        try {
+            const response = await fetch(`/upload/chunked/${uploadId}?offset=${offset}`, {
+                method: 'PUT',
+                body: file.slice(offset, offset + CHUNK_SIZE)
+            });
+            const data = await response.json();
+            if (response.ok) {
+                retries = 0;
+                onProgress();
+            } else if (data.offset === undefined || retries >= MAX_CHUNK_RETRIES) {
+                throw new Error(data.error);
+            } else {
+                // On 409 the server says where the file really ends; carry on from there
+                retries++;
+            }
+            offset = data.offset;
+        } catch (error) {
+            if (retries >= MAX_CHUNK_RETRIES) throw error;
+            addLog('System', `Chunk at ${offset} failed, resuming...`, 'warning');
+            // Back off, then ask the server how much actually arrived
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** retries));
+            retries++;
+            try {
+                const status = await (await fetch(`/upload/chunked/${uploadId}`)).json();
+                if (status.offset !== undefined) offset = status.offset;
+            } catch (statusError) {
+                // Keep the offset; a wrong one is corrected by the next PUT's 409
+            }
+        }
+    }
+}
+
+function startProcessing(filepath, session) {
     if (statsTimer) clearInterval(statsTimer);
 
     dropZone.classList.add('hidden');
@@ -86,11 +144,12 @@ function startProcessing(filepath) {
 
     // Set the source of the image to the streaming endpoint
     // We add a timestamp to bypass cache
-    processedFeed.src = `/video_feed?path=${encodeURIComponent(filepath)}&t=${new Date().getTime()}`;
+    // The session id keeps this stream's stats separate from other uploads
+    processedFeed.src = `/video_feed?path=${encodeURIComponent(filepath)}&session=${encodeURIComponent(session)}&t=${new Date().getTime()}`;
 
     // Polling for Stats (Real-time updates)
     statsTimer = setInterval(() => {
-        fetch('/stats')
+        fetch(`/stats?session=${encodeURIComponent(session)}`)
             .then(response => response.json())
             .then(data => {
                 document.getElementById('signal-count').innerText = data.signal;
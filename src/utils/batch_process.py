@@ -0,0 +1,385 @@
+"""
+Headless batch processing of recorded footage.
+
+Spreads every video in a directory over a process pool (one model load per
+worker) and writes, for each input, the processed video plus a per-frame
+JSONL violation log.
+
+Usage:
+    python utils/batch_process.py data/input/input_videos -o data/output/batch -w 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# Per-worker state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path, threads_per_worker, progress_every, db_path=None):
+    """Load the models once per worker process."""
+    if threads_per_worker:
+        try:
+            import torch
+            torch.set_num_threads(threads_per_worker)
+        except ImportError:
+            pass
+
+    from core.model_pool import ModelPool
+    _worker['pool'] = ModelPool(model_path=model_path)
+    _worker['progress_every'] = progress_every
+    _worker['store'] = None
+    if db_path:
+        from core.store import ViolationStore
+        _worker['store'] = ViolationStore(db_path)
+
+
+def _process_one(job):
+    """Run one video through a fresh detector session on the worker's models."""
+    from core.checkpoint import JobCheckpoint, input_fingerprint
+    from core.detector import TrafficDetector
+    from core.ledger import ViolationLedger
+
+    input_path, output_dir, options = job
+    options = dict(options)
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    video = os.path.basename(input_path)
+    write_video = options.pop('write_video', True)
+    evidence_dir = os.path.join(output_dir, 'evidence', name) if options.pop('evidence', False) else None
+    checkpoint_every = options.pop('checkpoint_every', 0)
+    log_out = os.path.join(output_dir, f"{name}_violations.jsonl")
+
+    detector = TrafficDetector(pool=_worker['pool'])
+    ledger = ViolationLedger()
+    progress_every = _worker['progress_every']
+    store = _worker['store']
+
+    # Resume from the last checkpoint of an interrupted run of this video
+    checkpoint = None
+    resume = None
+    video_parts = []
+    log_offset = 0
+    if checkpoint_every:
+        checkpoint = JobCheckpoint(os.path.join(output_dir, '.checkpoints', f"{name}.json"), checkpoint_every)
+        state = checkpoint.load(input_path)
+        if state is not None and os.path.exists(log_out):
+            resume = state['detector']
+            ledger.load_state(state['ledger'])
+            video_parts = state.get('video_parts', [])
+            log_offset = state['log_offset']
+            if store is not None:
+                store.discard(video=video, after_frame=state['frame'])
+
+    video_out = None
+    if write_video:
+        # A resumed run cannot append to the old mp4, so it continues in a new part
+        base, ext = os.path.splitext(f"processed_{video}")
+        part = f".part{len(video_parts) + 1}" if video_parts else ''
+        video_out = os.path.join(output_dir, f"{base}{part}{ext}")
+        video_parts.append(video_out)
+
+    frames = resume['frame'] if resume else 0
+    processed = 0
+    start = time.time()
+    with open(log_out, 'r+' if resume else 'w') as log:
+        # Drop log lines written after the checkpoint; they are produced again
+        log.seek(log_offset)
+        log.truncate()
+        # Nothing is drawn unless the annotated video is written
+        for _, violations in detector.process_video(input_path, video_out, render=False,
+                                                    evidence_dir=evidence_dir, resume=resume, **options):
+            # Source frame number (frames skipped by frame_stride are not yielded)
+            frames = detector.frame_position
+            processed += 1
+            new = ledger.record(violations)
+            if store is not None and new:
+                store.add(new, video=video, frame=frames)
+            log.write(json.dumps({
+                'frame': frames,
+                'violations': violations,
+                'new': len(new)
+            }, default=str) + '\n')
+            if progress_every and processed % progress_every == 0:
+                print(f"  [{os.getpid()}] {name}: {frames} frames")
+            if checkpoint is not None and checkpoint.due(frames):
+                log.flush()
+                checkpoint.save({
+                    'input': input_fingerprint(input_path),
+                    'frame': frames,
+                    'detector': detector.checkpoint_state(),
+                    'ledger': ledger.state(),
+                    'log_offset': log.tell(),
+                    'video_parts': video_parts,
+                })
+    if store is not None:
+        store.flush()
+    if checkpoint is not None:
+        checkpoint.remove()
+    elapsed = time.time() - start
+
+    return {
+        'video': input_path,
+        'output': video_parts if len(video_parts) > 1 else video_out,
+        'log': log_out,
+        'evidence_clips': len(detector.evidence.clips) if detector.evidence is not None else 0,
+        'frames': frames,
+        'resumed_at': resume['frame'] if resume else None,
+        'seconds': round(elapsed, 2),
+        'fps': round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+        'stats': ledger.snapshot()
+    }
+
+
+def _process_segment(job):
+    """Process one time segment of a video (plus its warm-up overlap) on the worker's models."""
+    from core.detector import TrafficDetector
+    from core.segments import ID_STRIDE
+
+    input_path, output_dir, options, segment = job
+    options = dict(options)
+    overlap = options.pop('overlap')
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    segment_log = os.path.join(output_dir, '.segments', f"{name}.seg{segment['index']}.jsonl")
+    os.makedirs(os.path.dirname(segment_log), exist_ok=True)
+
+    detector = TrafficDetector(pool=_worker['pool'])
+    # Start at the warm-up frame; this segment's track ids live in their own range
+    resume = {'frame': segment['warm_start'] - 1, 'max_track_id': segment['index'] * ID_STRIDE}
+    start, end = segment['start'], segment['end']
+    head, tail = {}, {}
+    owned = 0
+    started = time.time()
+    with open(segment_log, 'w') as log:
+        # Sequential mode keeps detector.last_tracks in step with the yielded frame
+        for _, violations in detector.process_video(input_path, None, render=False, resume=resume,
+                                                    end_frame=end, pipelined=False, **options):
+            frame = detector.frame_position
+            if frame < start:
+                head[frame] = detector.last_tracks
+                continue
+            owned += 1
+            log.write(json.dumps({'frame': frame, 'violations': violations}, default=str) + '\n')
+            if end is not None and frame > end - overlap:
+                tail[frame] = detector.last_tracks
+    return {
+        'index': segment['index'],
+        'log': segment_log,
+        'head': head,
+        'tail': tail,
+        'frames': owned,
+        'seconds': round(time.time() - started, 2),
+    }
+
+
+def _merge_segments(input_path, output_dir, results, store=None):
+    """Stitch track ids across segment boundaries and merge the logs and stats in order."""
+    from core.ledger import ViolationLedger
+    from core.segments import stitch
+
+    results = sorted(results, key=lambda r: r['index'])
+    remap = stitch(results)
+    name = os.path.splitext(os.path.basename(input_path))[0]
+    video = os.path.basename(input_path)
+    log_out = os.path.join(output_dir, f"{name}_violations.jsonl")
+    ledger = ViolationLedger()
+
+    frames = 0
+    with open(log_out, 'w') as log:
+        for result in results:
+            with open(result['log']) as segment_log:
+                for line in segment_log:
+                    record = json.loads(line)
+                    violations = record['violations']
+                    for v in violations:
+                        v['track_id'] = remap.get(v.get('track_id'), v.get('track_id'))
+                    frames += 1
+                    new = ledger.record(violations)
+                    if store is not None and new:
+                        store.add(new, video=video, frame=record['frame'])
+                    log.write(json.dumps({
+                        'frame': record['frame'],
+                        'violations': violations,
+                        'new': len(new)
+                    }, default=str) + '\n')
+            os.remove(result['log'])
+    if not os.listdir(os.path.join(output_dir, '.segments')):
+        os.rmdir(os.path.join(output_dir, '.segments'))
+    if store is not None:
+        store.flush()
+
+    return {
+        'video': input_path,
+        'output': None,
+        'log': log_out,
+        'segments': len(results),
+        'stitched_tracks': len(remap),
+        'frames': frames,
+        'stats': ledger.snapshot()
+    }
+
+
+def find_videos(input_dir):
+    return sorted(os.path.join(input_dir, f) for f in os.listdir(input_dir)
+                  if f.lower().endswith(VIDEO_EXTENSIONS))
+
+
+def run_batch(input_dir, output_dir, workers=None, model_path=None, progress_every=100,
+              pipelined=False, batch_size=1, motion_gating=False,
+              crop_violations=False, write_video=True, evidence=False, db_path=None, checkpoint_every=900,
+              segments=1, overlap=30, frame_stride=1, decode_width=None):
+    """
+    Process every video in ``input_dir`` over a pool of worker processes.
+
+    With ``segments`` > 1 each video is instead split into time segments that
+    run in parallel and are merged with stitched track ids (logs and stats
+    only: no annotated video, evidence clips or checkpoints in that mode).
+
+    Returns:
+        dict: Per-video results plus an overall throughput summary
+    """
+    videos = find_videos(input_dir)
+    if not videos:
+        print(f"No videos found in {input_dir}")
+        return {'videos': [], 'summary': {}}
+
+    os.makedirs(output_dir, exist_ok=True)
+    cpus = os.cpu_count() or 1
+    if segments > 1:
+        return _run_segmented(videos, output_dir, workers, model_path, progress_every, db_path,
+                              {'motion_gating': motion_gating,
+                               'crop_violations': crop_violations, 'overlap': overlap,
+                               'frame_stride': frame_stride, 'decode_width': decode_width},
+                              segments, overlap)
+    workers = max(1, min(workers or cpus, len(videos)))
+    threads_per_worker = max(1, cpus // workers)
+    options = {'pipelined': pipelined, 'batch_size': batch_size, 'motion_gating': motion_gating,
+               'crop_violations': crop_violations, 'write_video': write_video,
+               'evidence': evidence, 'checkpoint_every': checkpoint_every,
+               'frame_stride': frame_stride, 'decode_width': decode_width}
+
+    print(f"🎬 {len(videos)} videos, {workers} workers ({threads_per_worker} threads each)")
+    start = time.time()
+    results = []
+    # 'spawn' keeps each worker's model/tracker state independent of the parent
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_path, threads_per_worker, progress_every, db_path)) as pool:
+        jobs = [(path, output_dir, options) for path in videos]
+        for done, result in enumerate(pool.imap_unordered(_process_one, jobs), 1):
+            results.append(result)
+            print(f"✅ [{done}/{len(videos)}] {os.path.basename(result['video'])}: "
+                  f"{result['frames']} frames in {result['seconds']}s ({result['fps']} fps)")
+    elapsed = time.time() - start
+
+    return _summarize(results, output_dir, workers, elapsed)
+
+
+def _run_segmented(videos, output_dir, workers, model_path, progress_every, db_path, options, segments, overlap):
+    """Segment-parallel mode of ``run_batch``: one video at a time, its segments over the pool."""
+    from core.frame_source import FrameSource
+    from core.segments import plan_segments
+
+    plans = {}
+    for path in videos:
+        with FrameSource(path) as source:
+            plans[path] = plan_segments(source.frame_count, segments, overlap)
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, max(len(plan) for plan in plans.values())))
+    threads_per_worker = max(1, cpus // workers)
+    store = None
+    if db_path:
+        from core.store import ViolationStore
+        store = ViolationStore(db_path)
+
+    print(f"🎬 {len(videos)} videos in up to {segments} segments each, {workers} workers")
+    start = time.time()
+    results = []
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(model_path, threads_per_worker, progress_every)) as pool:
+        for path in videos:
+            video_start = time.time()
+            jobs = [(path, output_dir, options, segment) for segment in plans[path]]
+            result = _merge_segments(path, output_dir, pool.map(_process_segment, jobs), store)
+            elapsed = time.time() - video_start
+            result['seconds'] = round(elapsed, 2)
+            result['fps'] = round(result['frames'] / elapsed, 2) if elapsed > 0 else 0.0
+            results.append(result)
+            print(f"✅ {os.path.basename(path)}: {result['frames']} frames in {result['segments']} segments, "
+                  f"{result['stitched_tracks']} tracks stitched, {result['seconds']}s ({result['fps']} fps)")
+    if store is not None:
+        store.close()
+    return _summarize(results, output_dir, workers, time.time() - start)
+
+
+def _summarize(results, output_dir, workers, elapsed):
+    total_frames = sum(r['frames'] for r in results)
+    summary = {
+        'videos': len(results),
+        'workers': workers,
+        'frames': total_frames,
+        'seconds': round(elapsed, 2),
+        'fps': round(total_frames / elapsed, 2) if elapsed > 0 else 0.0
+    }
+    print(f"\n📊 Done: {summary['frames']} frames from {summary['videos']} videos "
+          f"in {summary['seconds']}s ({summary['fps']} fps overall)")
+
+    with open(os.path.join(output_dir, 'batch_summary.json'), 'w') as f:
+        json.dump({'videos': results, 'summary': summary}, f, indent=2)
+    return {'videos': results, 'summary': summary}
+
+
+def main():
+    default_input = os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'input_videos')
+    default_output = os.path.join(os.path.dirname(__file__), '..', 'data', 'output', 'batch')
+
+    parser = argparse.ArgumentParser(description="Batch-process a directory of traffic videos.")
+    parser.add_argument('input_dir', nargs='?', default=default_input, help="Directory of videos")
+    parser.add_argument('-o', '--output-dir', default=default_output, help="Where outputs are written")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('-m', '--model', default=None, help="Custom violation model weights")
+    parser.add_argument('--progress-every', type=int, default=100, help="Print progress every N frames")
+    parser.add_argument('--pipelined', action='store_true', help="Use the threaded pipeline inside each worker")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="Violation-model micro-batch size across in-flight frames (with --pipelined)")
+    parser.add_argument('--motion-gating', action='store_true', help="Skip inference on frames without motion")
+    parser.add_argument('--crop-violations', action='store_true',
+                        help="Run the violation model on crops around tracked motorcycles")
+    parser.add_argument('--evidence', action='store_true',
+                        help="Write short clips + snapshots around each new violation to <output>/evidence")
+    parser.add_argument('--db', default=None, help="Also store first-seen violations in this SQLite file")
+    parser.add_argument('--checkpoint-every', type=int, default=900,
+                        help="Frames between resume checkpoints (0 disables); interrupted videos resume")
+    parser.add_argument('--segments', type=int, default=1,
+                        help="Split each video into N time segments processed in parallel (logs/stats only)")
+    parser.add_argument('--overlap', type=int, default=30,
+                        help="Frames shared by neighbouring segments for track stitching")
+    parser.add_argument('--frame-stride', type=int, default=1,
+                        help="Analyse every N-th frame; the others are skipped without decoding")
+    parser.add_argument('--decode-width', type=int, default=None,
+                        help="Downscale wider videos to this width once, right after decoding")
+    parser.add_argument('--no-video', action='store_true',
+                        help="Only write the violation logs (headless: no annotated video, no drawing)")
+    args = parser.parse_args()
+    # Workers do not share a batcher, so only the pipeline's in-flight frames can fill a batch
+    if args.batch_size > 1 and (not args.pipelined or args.segments > 1):
+        parser.error("--batch-size needs --pipelined (and is not used with --segments)")
+
+    run_batch(args.input_dir, args.output_dir, workers=args.workers, model_path=args.model,
+              progress_every=args.progress_every, pipelined=args.pipelined, batch_size=args.batch_size,
+              motion_gating=args.motion_gating, crop_violations=args.crop_violations,
+              write_video=not args.no_video, evidence=args.evidence, db_path=args.db,
+              checkpoint_every=args.checkpoint_every, segments=args.segments, overlap=args.overlap,
+              frame_stride=args.frame_stride, decode_width=args.decode_width)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Export the detection models for a faster CPU backend and check parity.
+
+Exports the base and violation weights to ONNX (optionally INT8-quantized,
+calibrated on frames from data/input), caches the files next to the
+weights and compares their detections with the PyTorch originals.
+
+Usage:
+    python utils/export_models.py --backend onnx
+    python utils/export_models.py --backend onnx-int8 --frames 32
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from core.backends import BACKENDS, collect_calibration_frames, load_model, parity_check
+from core.enhancer import NightEnhancer
+from core.model_pool import BASE_WEIGHTS, find_violation_weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export models to ONNX / INT8 and run a parity check.")
+    parser.add_argument('--backend', choices=[b for b in BACKENDS if b != 'torch'], default='onnx')
+    parser.add_argument('--model', default=None, help="Custom violation weights (default: auto-detect)")
+    parser.add_argument('--frames', type=int, default=32, help="Calibration / parity frames")
+    parser.add_argument('--imgsz', type=int, default=640, help="Export input size")
+    parser.add_argument('--min-recall', type=float, default=0.9, help="Parity pass threshold")
+    args = parser.parse_args()
+
+    raw_frames = collect_calibration_frames(count=args.frames)
+    enhanced_frames = collect_calibration_frames(count=args.frames, enhancer=NightEnhancer())
+    print(f"🎞️  {len(raw_frames)} frames sampled from data/input")
+
+    targets = [('base', BASE_WEIGHTS, raw_frames)]
+    violation_weights = args.model or find_violation_weights()
+    if violation_weights:
+        # The violation model runs on night-enhanced frames
+        targets.append(('violation', violation_weights, enhanced_frames))
+
+    report = {}
+    all_passed = True
+    for name, weights, frames in targets:
+        model, torch_model = load_model(weights, args.backend, imgsz=args.imgsz, calibration_frames=frames,
+                                        reference=True)
+        result = parity_check(torch_model, model, frames, min_recall=args.min_recall)
+        report[name] = dict(result, weights=weights, backend=args.backend)
+        all_passed &= result['passed']
+        status = "✅" if result['passed'] else "❌"
+        print(f"{status} {name}: recall {result['recall']} | mean IoU {result['mean_iou']} | "
+              f"max conf diff {result['max_conf_diff']}")
+
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if all_passed else 1)
+
+
+if __name__ == "__main__":
+    main()
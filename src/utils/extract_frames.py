@@ -1,5 +1,9 @@
 import cv2
 import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from core.frame_source import FrameSource
 
 def extract_frames(video_dir="input_videos", output_dir="training_data/images"):
     if not os.path.exists(output_dir):
@@ -11,31 +15,23 @@ def extract_frames(video_dir="input_videos", output_dir="training_data/images"):
     
     for video_file in video_files:
         path = os.path.join(video_dir, video_file)
-        cap = cv2.VideoCapture(path)
         
-        frame_count = 0
         saved_count = 0
         
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        with FrameSource(path) as probe:
+            fps = int(probe.fps)
         if fps == 0: fps = 30 # Fallback
         
         print(f"Processing {video_file} (FPS: {fps})...")
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Save 1 frame every second (frame_count % fps == 0)
-            if frame_count % fps == 0:
+        # Save 1 frame every second; the frames in between are skipped without decoding
+        with FrameSource(path, stride=fps) as source:
+            for _, frame in source:
                 frame_name = f"{os.path.splitext(video_file)[0]}_frame_{saved_count}.jpg"
                 cv2.imwrite(os.path.join(output_dir, frame_name), frame)
                 saved_count += 1
                 total_frames += 1
             
-            frame_count += 1
-            
-        cap.release()
         print(f"  -> Extracted {saved_count} images from {video_file}")
 
     print(f"\nDone! Total extracted images: {total_frames}")
@@ -5,6 +5,10 @@ from ultralytics import YOLO
 import shutil
 from pathlib import Path
 import yaml
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from core.frame_source import FrameSource
 
 class TrainingManager:
     def __init__(self, base_dir=None):
@@ -104,29 +108,22 @@ class TrainingManager:
             violation_type (str): Violation type for naming
             frame_interval (int): Extract every nth frame
         """
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+        # Frames between the extracted ones are skipped without decoding
+        source = FrameSource(video_path, stride=frame_interval)
+        if not source.isOpened():
             print(f"Error opening video: {video_path}")
             return
             
-        frame_count = 0
         extracted_count = 0
         video_name = os.path.splitext(os.path.basename(video_path))[0]
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            if frame_count % frame_interval == 0:
-                frame_filename = f"{violation_type}_{video_name}_frame_{extracted_count:04d}.jpg"
-                frame_path = os.path.join(output_dir, frame_filename)
-                cv2.imwrite(frame_path, frame)
-                extracted_count += 1
-                
-            frame_count += 1
+        for _, frame in source:
+            frame_filename = f"{violation_type}_{video_name}_frame_{extracted_count:04d}.jpg"
+            frame_path = os.path.join(output_dir, frame_filename)
+            cv2.imwrite(frame_path, frame)
+            extracted_count += 1
             
-        cap.release()
+        source.release()
         print(f"Extracted {extracted_count} frames from {video_name} for {violation_type}")
         
     def create_dataset_yaml(self, output_path=None):
@@ -0,0 +1,116 @@
+"""
+Headless multi-camera monitoring on one box.
+
+Runs every camera through a CameraScheduler sharing one model pool, each
+with its own FPS budget, and prints per-camera throughput and lag so you
+can see how many intersections a box can take before it is oversubscribed.
+
+Usage:
+    python utils/watch_cameras.py gate=rtsp://10.0.0.5/stream1 junction=rtsp://10.0.0.6/stream1 --fps 5
+    python utils/watch_cameras.py a=data/input/clip.mp4 b=data/input/clip.mp4 --camera-fps a=10 --duration 60
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def _pairs(entries, cast=str):
+    pairs = {}
+    for entry in entries or []:
+        name, sep, value = entry.partition('=')
+        if not sep or not name:
+            raise SystemExit(f"Expected NAME=VALUE, got '{entry}'")
+        pairs[name] = cast(value)
+    return pairs
+
+
+def watch(cameras, fps=5.0, camera_fps=None, priorities=None, workers=2, policy='round_robin',
+          model_path=None, motion_gating=False, evidence_dir=None, db_path=None, duration=None,
+          report_every=5.0):
+    """
+    Schedule ``cameras`` ({name: url}) until ``duration`` seconds pass (None: until Ctrl+C).
+
+    Returns:
+        dict: Final ``CameraScheduler.stats()`` plus first-seen violation stats per camera
+    """
+    from core.ledger import ViolationLedger
+    from core.model_pool import ModelPool
+    from core.scheduler import CameraScheduler
+
+    camera_fps = camera_fps or {}
+    priorities = priorities or {}
+    store = None
+    if db_path:
+        from core.store import ViolationStore
+        store = ViolationStore(db_path)
+    ledgers = {name: ViolationLedger() for name in cameras}
+
+    def on_result(camera, frame_count, frame, violations):
+        new = ledgers[camera.name].record(violations)
+        if store is not None and new:
+            store.add(new, video=camera.name, frame=frame_count)
+
+    scheduler = CameraScheduler(pool=ModelPool(model_path=model_path), workers=workers, policy=policy,
+                                motion_gating=motion_gating, evidence_dir=evidence_dir)
+    for name, url in cameras.items():
+        scheduler.add_camera(name, url, target_fps=camera_fps.get(name, fps),
+                             priority=priorities.get(name, 0), on_result=on_result)
+    scheduler.start()
+
+    start = time.time()
+    try:
+        while duration is None or time.time() - start < duration:
+            remaining = None if duration is None else duration - (time.time() - start)
+            time.sleep(report_every if remaining is None else max(0.0, min(report_every, remaining)))
+            stats = scheduler.stats()
+            flag = "⚠️ OVERSUBSCRIBED" if stats['oversubscribed'] else "✅"
+            print(f"{flag} {stats['fps']}/{stats['target_fps']} fps, utilization {stats['utilization']}")
+            for c in stats['cameras']:
+                print(f"   {c['camera']:16s} {c['fps']:6.2f}/{c['target_fps']:<5g} fps  lag {c['lag_ms']:7.1f} ms  "
+                      f"skipped {c['skipped']:5d}  dropped {c['source']['frames_dropped']:6d}"
+                      f"{'  BEHIND' if c['behind'] else ''}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats = scheduler.stats()
+        scheduler.stop()
+        if store is not None:
+            store.close()
+
+    stats['violations'] = {name: ledger.snapshot() for name, ledger in ledgers.items()}
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch many live cameras on one shared model pool.")
+    parser.add_argument('cameras', nargs='+', help="NAME=URL (RTSP/HTTP URL, device index or a looped file)")
+    parser.add_argument('--fps', type=float, default=5.0, help="Default analysed frames per second per camera")
+    parser.add_argument('--camera-fps', nargs='*', default=[], help="NAME=FPS overrides")
+    parser.add_argument('--priority', nargs='*', default=[], help="NAME=PRIORITY (with --policy priority)")
+    parser.add_argument('-w', '--workers', type=int, default=2, help="Frames analysed concurrently")
+    parser.add_argument('--policy', choices=('round_robin', 'priority'), default='round_robin')
+    parser.add_argument('-m', '--model', default=None, help="Custom violation model weights")
+    parser.add_argument('--motion-gating', action='store_true', help="Skip inference on frames without motion")
+    parser.add_argument('--evidence', default=None, help="Write evidence clips per camera under this directory")
+    parser.add_argument('--db', default=None, help="Store first-seen violations in this SQLite file")
+    parser.add_argument('--duration', type=float, default=None, help="Stop after N seconds (default: Ctrl+C)")
+    parser.add_argument('--report-every', type=float, default=5.0, help="Seconds between reports")
+    parser.add_argument('-o', '--output', default=None, help="Write the final stats as JSON here")
+    args = parser.parse_args()
+
+    stats = watch(_pairs(args.cameras), fps=args.fps, camera_fps=_pairs(args.camera_fps, float),
+                  priorities=_pairs(args.priority, int), workers=args.workers, policy=args.policy,
+                  model_path=args.model, motion_gating=args.motion_gating, evidence_dir=args.evidence,
+                  db_path=args.db, duration=args.duration, report_every=args.report_every)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f"💾 Stats written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()